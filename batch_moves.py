@@ -0,0 +1,135 @@
+"""
+Vectorized move generation for many positions at once.
+
+The functions of bitboard.py applied to NumPy arrays of positions: a batch
+is either an (N, 8, 8) int8 array of boards (as the game drivers hand them to
+the players, board[row][col]) or an (N, 2) uint64 array of (own, opp)
+bitboards of the player to move. Every step works on the whole batch with
+shifts and masks, there is no Python loop over the positions.
+
+Requires NumPy.
+"""
+import numpy as np
+
+from bitboard import DIRECTIONS, FULL
+
+_DIRECTIONS = [(np.uint64(shift), np.uint64(left_mask), np.uint64(right_mask))
+               for shift, left_mask, right_mask in DIRECTIONS]
+_FULL = np.uint64(FULL)
+_ZERO = np.uint64(0)
+_ONE = np.uint64(1)
+
+
+def square_bits(bb):
+    # (N, 64) uint8 array, column sq is bit sq of the bitboards
+    return np.unpackbits(bb.astype('<u8').view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+
+
+def from_bits(bits):
+    # Inverse of square_bits: (N, 64) array of 0/1 -> (N,) uint64
+    packed = np.packbits(np.asarray(bits, dtype=np.uint8).reshape(-1, 64), axis=1, bitorder='little')
+    return packed.view('<u8').reshape(-1).astype(np.uint64)
+
+
+def from_boards(boards, own_color, opp_color):
+    """
+    (N, 8, 8) boards -> (N, 2) uint64 (own, opp) bitboards
+    """
+    cells = np.asarray(boards).reshape(-1, 64)
+    return np.stack([from_bits(cells == own_color), from_bits(cells == opp_color)], axis=1)
+
+
+def to_boards(bitboards, own_color, opp_color, empty_color=-1):
+    """
+    (N, 2) uint64 (own, opp) bitboards -> (N, 8, 8) int8 boards
+    """
+    own = square_bits(bitboards[:, 0]).astype(bool)
+    opp = square_bits(bitboards[:, 1]).astype(bool)
+    cells = np.full(own.shape, empty_color, dtype=np.int8)
+    cells[own] = own_color
+    cells[opp] = opp_color
+    return cells.reshape(-1, 8, 8)
+
+
+def legal_moves(own, opp):
+    """
+    (N,) uint64 bitboards of the legal moves of the players owning `own`
+    """
+    empty = ~(own | opp) & _FULL
+    moves = np.zeros_like(own)
+    for shift, left_mask, right_mask in _DIRECTIONS:
+        o = opp & left_mask
+        x = (own << shift) & o
+        for _ in range(5):
+            x |= (x << shift) & o
+        moves |= (x << shift) & left_mask & empty
+
+        o = opp & right_mask
+        x = (own >> shift) & o
+        for _ in range(5):
+            x |= (x >> shift) & o
+        moves |= (x >> shift) & right_mask & empty
+    return moves
+
+
+def flips(own, opp, squares):
+    """
+    (N,) uint64 bitboards of the discs flipped by playing at `squares`
+    (0 where the move is not legal)
+    """
+    move = _ONE << squares.astype(np.uint64)
+    flipped = np.zeros_like(own)
+    for shift, left_mask, right_mask in _DIRECTIONS:
+        # The run of opponent discs next to the move, flipped if one of our discs ends it
+        o = opp & left_mask
+        run = (move << shift) & o
+        for _ in range(5):
+            run |= (run << shift) & o
+        flipped |= np.where((run << shift) & left_mask & own, run, _ZERO)
+
+        o = opp & right_mask
+        run = (move >> shift) & o
+        for _ in range(5):
+            run |= (run >> shift) & o
+        flipped |= np.where((run >> shift) & right_mask & own, run, _ZERO)
+    return flipped
+
+
+def play(own, opp, squares):
+    """
+    Plays one move per position, returns the (own, opp) bitboards after
+    the move, seen by the player to move next
+    """
+    flipped = flips(own, opp, squares)
+    return opp ^ flipped, own | flipped | (_ONE << squares.astype(np.uint64))
+
+
+def expand(own, opp):
+    """
+    All legal moves of all positions: returns (parents, squares, children)
+    where move number i is `squares[i]` in position `parents[i]` and
+    children[i] is the (own, opp) row of the position after it
+    """
+    moves = legal_moves(own, opp)
+    parents, squares = np.nonzero(square_bits(moves))
+    child_own, child_opp = play(own[parents], opp[parents], squares)
+    return parents, squares, np.stack([child_own, child_opp], axis=1)
+
+
+def batch_moves(positions, own_color=0, opp_color=1):
+    """
+    Legal moves and the positions after them for a batch of positions given
+    as (N, 8, 8) int8 boards (`own_color` to move) or (N, 2) uint64 bitboards.
+    Returns (legal move masks as (N, 8, 8) bool, parents, squares, children)
+    with parents/squares as in expand and children in the representation of
+    the input (boards keep the colors, so the opponent is to move on them)
+    """
+    positions = np.asarray(positions)
+    is_boards = positions.ndim == 3
+    bitboards = from_boards(positions, own_color, opp_color) if is_boards else positions.astype(np.uint64)
+    own, opp = bitboards[:, 0], bitboards[:, 1]
+    masks = square_bits(legal_moves(own, opp)).astype(bool).reshape(-1, 8, 8)
+    parents, squares, children = expand(own, opp)
+    if is_boards:
+        children = to_boards(children, opp_color, own_color)
+    return masks, parents, squares, children
@@ -0,0 +1,308 @@
+"""
+Benchmarks of the player and the board on a fixed corpus of positions.
+
+The corpus holds 4 opening, 4 midgame and 4 endgame positions (random games
+of a fixed seed, the player to move has discs 'own'). Every benchmark runs
+`warmup` times untimed and then `repeats` timed repetitions; the report gives
+ms per operation (min/median/mean/stdev over the repetitions), operations and
+nodes per second. MyPlayer searches to a fixed depth without the opening book,
+so its node counts only change when the search changes.
+
+>> python benchmark.py -o before.json
+>> python benchmark.py -o after.json -c before.json
+
+-r  timed repetitions (default 5)
+-w  warmup repetitions (default 1)
+-d  search depth of MyPlayer (default 5)
+-g  number of games of the game benchmark (default 2)
+-b  comma separated benchmarks to run (default all: player_move, find_moves,
+    repaint_the_board, play_move, can_play, games)
+-o  JSON file for the results
+-c  JSON file of earlier results, prints the speedup of every benchmark
+"""
+import getopt
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import redirect_stdout
+
+from bitboard import Position, iter_squares, to_board
+from game_board import GameBoard
+from headless_reversi_creator import QUIET, HeadlessReversiCreator
+import player
+import random_player
+
+CORPUS = {
+    'opening': (
+        (0x0000003810080000, 0x0000000408100000),
+        (0x0000042C0C000000, 0x0000201010100000),
+        (0x0000600000380000, 0x0010101C18000000),
+        (0x00001C0804000000, 0x00004030381C0000),
+    ),
+    'midgame': (
+        (0x00000838FC6A8000, 0x2060200000050301),
+        (0x4828182810081400, 0x02542010E8F44000),
+        (0x020033111B001010, 0x090E0C0E247E0200),
+        (0x1118543024029900, 0x08070A0F9B512040),
+    ),
+    'endgame': (
+        (0x0C0E3814B2410000, 0x02F0C2E9483C3E0F),
+        (0x001030B850324184, 0x06EE4E06AF4C3C68),
+        (0xFF67EF946C5CA020, 0x0088102A13224480),
+        (0x04864E7F3F39B703, 0xF069B10040844020),
+    ),
+}
+
+MY_COLOR = 0
+OPPONENT_COLOR = 1
+BENCHMARKS = ('player_move', 'find_moves', 'repaint_the_board', 'play_move', 'can_play', 'games')
+
+
+def corpus_positions():
+    # [(phase, own, opp)] of the whole corpus
+    return [(phase, own, opp) for phase, positions in CORPUS.items() for own, opp in positions]
+
+
+def corpus_boards():
+    # [(phase, board)], MY_COLOR is to move
+    return [(phase, to_board(own, opp, MY_COLOR, OPPONENT_COLOR)) for phase, own, opp in corpus_positions()]
+
+
+def legal_squares(own, opp):
+    return [divmod(sq, 8) for sq in iter_squares(Position(own, opp).moves())]
+
+
+def player_move_run(phase, depth):
+    """
+    One MyPlayer.move per position of the phase, a new player for every
+    move so the transposition table starts empty
+    """
+    boards = [board for board_phase, board in corpus_boards() if board_phase == phase]
+
+    def run():
+        nodes = 0
+        elapsed = 0.0
+        for board in boards:
+            searcher = player.MyPlayer(MY_COLOR, OPPONENT_COLOR, time_limit_ms=3600 * 1000,
+                                       book_path=None, max_depth=depth)
+            start = time.perf_counter()
+            searcher.move(board)
+            elapsed += time.perf_counter() - start
+            nodes += searcher.search_info['nodes']
+            searcher.close()
+        return elapsed, len(boards), nodes
+    return run
+
+
+def find_moves_run():
+    searcher = player.MyPlayer(MY_COLOR, OPPONENT_COLOR, book_path=None)
+    boards = [board for _, board in corpus_boards()]
+
+    def run():
+        start = time.perf_counter()
+        for board in boards:
+            searcher.find_moves(board, MY_COLOR, OPPONENT_COLOR)
+        return time.perf_counter() - start, len(boards), 0
+    return run
+
+
+def repaint_the_board_run():
+    searcher = player.MyPlayer(MY_COLOR, OPPONENT_COLOR, book_path=None)
+    moves = [(board, row, col) for (_, board), (_, own, opp) in zip(corpus_boards(), corpus_positions())
+             for row, col in legal_squares(own, opp)]
+
+    def run():
+        # The boards are copied before the clock starts
+        copies = [[line[:] for line in board] for board, _, _ in moves]
+        start = time.perf_counter()
+        for copy, (_, row, col) in zip(copies, moves):
+            searcher.repaint_the_board(copy, row, col, True)
+        return time.perf_counter() - start, len(moves), 0
+    return run
+
+
+def game_board_moves():
+    # [(snapshot, move)] of every legal move of the corpus on a GameBoard
+    game_board = GameBoard()
+    moves = []
+    for _, own, opp in corpus_positions():
+        game_board.set_masks(MY_COLOR, own, opp)
+        snapshot = game_board.snapshot()
+        moves.extend((snapshot, move) for move in legal_squares(own, opp))
+    return game_board, moves
+
+
+def play_move_run():
+    game_board, moves = game_board_moves()
+
+    def run():
+        start = time.perf_counter()
+        for snapshot, move in moves:
+            game_board.restore(snapshot)
+            game_board.play_move(move, MY_COLOR)
+        return time.perf_counter() - start, len(moves), 0
+    return run
+
+
+def can_play_run():
+    game_board, moves = game_board_moves()
+    # The positions after the moves, their legal moves are found by can_play
+    snapshots = []
+    for snapshot, move in moves:
+        game_board.restore(snapshot)
+        game_board.play_move(move, MY_COLOR)
+        snapshots.append(game_board.snapshot())
+
+    def run():
+        start = time.perf_counter()
+        for snapshot in snapshots:
+            game_board.restore(snapshot)
+            game_board.can_play(OPPONENT_COLOR)
+            game_board.can_play(MY_COLOR)
+        return time.perf_counter() - start, len(snapshots), 0
+    return run
+
+
+class CountingPlayer:
+    # Sums the nodes of the wrapped player
+    def __init__(self, searcher):
+        self.searcher = searcher
+        self.name = searcher.name
+        self.nodes = 0
+
+    def move(self, board):
+        move = self.searcher.move(board)
+        self.nodes += self.searcher.search_info['nodes']
+        return move
+
+
+def games_run(games, depth):
+    """
+    Full headless games of MyPlayer (fixed depth) against the random player
+    with a fixed seed, colors alternate
+    """
+    def run():
+        elapsed = 0.0
+        moves = 0
+        nodes = 0
+        random.seed(1)
+        for index in range(games):
+            my_color = index % 2
+            with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+                searcher = CountingPlayer(player.MyPlayer(my_color, 1 - my_color, time_limit_ms=3600 * 1000,
+                                                          book_path=None, max_depth=depth))
+                opponent = random_player.MyPlayer(1 - my_color, my_color)
+                players = {my_color: searcher, 1 - my_color: opponent}
+                game = HeadlessReversiCreator(players[0], 0, players[1], 1, 8, QUIET)
+                start = time.perf_counter()
+                game.play_game()
+                elapsed += time.perf_counter() - start
+            searcher.searcher.close()
+            moves += len(game.move_timer.histogram(0)) + len(game.move_timer.histogram(1))
+            nodes += searcher.nodes
+        return elapsed, moves, nodes
+    return run
+
+
+def measure(run, warmup, repeats):
+    """
+    Runs `run` (returning seconds, operations, nodes) warmup + repeats times,
+    statistics of the timed repetitions
+    """
+    for _ in range(warmup):
+        run()
+    samples = [run() for _ in range(repeats)]
+    ms_per_op = [seconds * 1000 / operations for seconds, operations, _ in samples]
+    seconds = sum(sample[0] for sample in samples)
+    operations = sum(sample[1] for sample in samples)
+    nodes = sum(sample[2] for sample in samples)
+    return {
+        'operations': samples[0][1],
+        'nodes': samples[0][2],
+        'ms_per_op_min': min(ms_per_op),
+        'ms_per_op_median': statistics.median(ms_per_op),
+        'ms_per_op_mean': statistics.mean(ms_per_op),
+        'ms_per_op_stdev': statistics.stdev(ms_per_op) if len(ms_per_op) > 1 else 0.0,
+        'ops_per_sec': operations / seconds if seconds else 0.0,
+        'nodes_per_sec': nodes / seconds if seconds else 0.0,
+    }
+
+
+def benchmark_runs(names, depth, games):
+    # {benchmark name: run function}
+    runs = {}
+    if 'player_move' in names:
+        for phase in CORPUS:
+            runs['player_move_' + phase] = player_move_run(phase, depth)
+    if 'find_moves' in names:
+        runs['find_moves'] = find_moves_run()
+    if 'repaint_the_board' in names:
+        runs['repaint_the_board'] = repaint_the_board_run()
+    if 'play_move' in names:
+        runs['play_move'] = play_move_run()
+    if 'can_play' in names:
+        runs['can_play'] = can_play_run()
+    if 'games' in names:
+        runs['games'] = games_run(games, depth)
+    return runs
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(names=BENCHMARKS, warmup=1, repeats=5, depth=5, games=2):
+    results = {}
+    for name, run in benchmark_runs(names, depth, games).items():
+        results[name] = measure(run, warmup, repeats)
+        print_result(name, results[name])
+    return {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'settings': {'warmup': warmup, 'repeats': repeats, 'depth': depth, 'games': games},
+        'benchmarks': results,
+    }
+
+
+def print_result(name, result):
+    line = '%-22s %10.4f ms/op (median, min %.4f, stdev %.4f) %12.1f ops/s' % (
+        name, result['ms_per_op_median'], result['ms_per_op_min'], result['ms_per_op_stdev'],
+        result['ops_per_sec'])
+    if result['nodes']:
+        line += ' %10.0f nodes/s' % result['nodes_per_sec']
+    print(line)
+
+
+def print_comparison(baseline, results):
+    print('\nspeedup against %s:' % (baseline.get('revision') or 'the baseline'))
+    for name, result in results['benchmarks'].items():
+        old = baseline['benchmarks'].get(name)
+        if old is None:
+            continue
+        line = '%-22s %6.2fx' % (name, old['ms_per_op_median'] / result['ms_per_op_median'])
+        if old['nodes'] != result['nodes']:
+            line += '  nodes %d -> %d' % (old['nodes'], result['nodes'])
+        print(line)
+
+
+if __name__ == "__main__":
+    (choices, args) = getopt.getopt(sys.argv[1:], "r:w:d:g:b:o:c:")
+    options = dict(choices)
+    names = options['-b'].split(',') if '-b' in options else BENCHMARKS
+    results = run_benchmarks(names, int(options.get('-w', 1)), int(options.get('-r', 5)),
+                             int(options.get('-d', 5)), int(options.get('-g', 2)))
+    if '-o' in options:
+        with open(options['-o'], 'w') as output:
+            json.dump(results, output, indent=2)
+    if '-c' in options:
+        with open(options['-c']) as baseline_file:
+            print_comparison(json.load(baseline_file), results)
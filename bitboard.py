@@ -0,0 +1,331 @@
+"""
+Bitboard representation of the reversi board.
+
+Square [row, col] of the list-of-lists board is bit number row * 8 + col.
+A position is kept as two 64-bit integers: discs of the player to move
+("own") and discs of the other player ("opp"). Moves and flips are computed
+with shifts and masks on the whole board at once instead of walking cells.
+
+Module-level functions work on the 8x8 board. Geometry provides the same
+for any board size (square [row, col] is bit row * size + col).
+"""
+from rays import get_rays
+
+try:
+    popcount = int.bit_count  # Python 3.10+
+except AttributeError:
+    def popcount(bb):
+        return bin(bb).count('1')
+
+FULL = 0xFFFFFFFFFFFFFFFF
+NOT_COL_0 = 0xFEFEFEFEFEFEFEFE  # every square except the first column
+NOT_COL_7 = 0x7F7F7F7F7F7F7F7F  # every square except the last column
+
+# (shift, mask after a left shift, mask after a right shift)
+# A left shift by 1 moves a disc one column to the right, by 8 one row down,
+# by 9 down-right and by 7 down-left. The masks drop discs that wrapped
+# around the edge of the board.
+DIRECTIONS = (
+    (1, NOT_COL_0, NOT_COL_7),
+    (8, FULL, FULL),
+    (9, NOT_COL_0, NOT_COL_7),
+    (7, NOT_COL_7, NOT_COL_0),
+)
+
+CORNERS = (1 << 0) | (1 << 7) | (1 << 56) | (1 << 63)
+
+
+def square(row, col):
+    return row * 8 + col
+
+
+def coords(sq):
+    return [sq >> 3, sq & 7]
+
+
+def iter_squares(bb):
+    # Yields indices of all set bits, lowest first
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+
+def from_board(board, own_color, opp_color):
+    """
+    Converts a list-of-lists board into (own, opp) bitboards
+    """
+    own = 0
+    opp = 0
+    bit = 1
+    for row in board:
+        for cell in row:
+            if cell == own_color:
+                own |= bit
+            elif cell == opp_color:
+                opp |= bit
+            bit <<= 1
+    return own, opp
+
+
+def to_board(own, opp, own_color, opp_color, empty_color=-1, size=8):
+    """
+    Converts (own, opp) bitboards back into a list-of-lists board
+    """
+    board = []
+    bit = 1
+    for _ in range(size):
+        row = []
+        for _ in range(size):
+            if own & bit:
+                row.append(own_color)
+            elif opp & bit:
+                row.append(opp_color)
+            else:
+                row.append(empty_color)
+            bit <<= 1
+        board.append(row)
+    return board
+
+
+def legal_moves(own, opp):
+    """
+    Returns a bitboard of all squares where the player owning `own` can move
+    """
+    empty = ~(own | opp) & FULL
+    moves = 0
+    for shift, left_mask, right_mask in DIRECTIONS:
+        # Runs of opponent discs starting next to one of our discs
+        o = opp & left_mask
+        x = (own << shift) & o
+        x |= (x << shift) & o
+        x |= (x << shift) & o
+        x |= (x << shift) & o
+        x |= (x << shift) & o
+        x |= (x << shift) & o
+        moves |= (x << shift) & left_mask & empty
+
+        o = opp & right_mask
+        x = (own >> shift) & o
+        x |= (x >> shift) & o
+        x |= (x >> shift) & o
+        x |= (x >> shift) & o
+        x |= (x >> shift) & o
+        x |= (x >> shift) & o
+        moves |= (x >> shift) & right_mask & empty
+    return moves
+
+
+def flips(own, opp, sq):
+    """
+    Returns a bitboard of opponent discs flipped by playing at `sq`
+    (0 if the move is not legal)
+    """
+    move = 1 << sq
+    flipped = 0
+    for shift, left_mask, right_mask in DIRECTIONS:
+        f = 0
+        x = (move << shift) & left_mask
+        while x & opp:
+            f |= x
+            x = (x << shift) & left_mask
+        if x & own:
+            flipped |= f
+
+        f = 0
+        x = (move >> shift) & right_mask
+        while x & opp:
+            f |= x
+            x = (x >> shift) & right_mask
+        if x & own:
+            flipped |= f
+    return flipped
+
+
+# Directions as (row step, column step), in the order of Geometry.rays
+class Geometry:
+    """
+    Shift masks and rays of one board size. On 8x8 legal_moves and flips
+    are the unrolled module-level functions.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.n_squares = size * size
+        self.full = (1 << self.n_squares) - 1
+        first_col = sum(1 << (row * size) for row in range(size))
+        not_first_col = self.full & ~first_col
+        not_last_col = self.full & ~(first_col << (size - 1))
+        # (shift, mask after a left shift, mask after a right shift), as DIRECTIONS
+        self.directions = (
+            (1, not_first_col, not_last_col),
+            (size, self.full, self.full),
+            (size + 1, not_first_col, not_last_col),
+            (size - 1, not_last_col, not_first_col),
+        )
+        last = size - 1
+        self.corners = (1 << 0) | (1 << last) | (1 << (last * size)) | (1 << (last * size + last))
+        # rays[sq][direction] - bits of the squares of rays.get_rays(size), nearest first
+        self.rays = [tuple(tuple(1 << (r * size + c) for r, c in ray) for ray in square_rays)
+                     for row_rays in get_rays(size) for square_rays in row_rays]
+        if size == 8:
+            self.legal_moves = legal_moves
+            self.flips = flips
+
+    def coords(self, sq):
+        return [sq // self.size, sq % self.size]
+
+    def legal_moves(self, own, opp):
+        """
+        Returns a bitboard of all squares where the player owning `own` can move
+        """
+        empty = ~(own | opp) & self.full
+        moves = 0
+        steps = range(self.size - 3)
+        for shift, left_mask, right_mask in self.directions:
+            o = opp & left_mask
+            x = (own << shift) & o
+            for _ in steps:
+                x |= (x << shift) & o
+            moves |= (x << shift) & left_mask & empty
+
+            o = opp & right_mask
+            x = (own >> shift) & o
+            for _ in steps:
+                x |= (x >> shift) & o
+            moves |= (x >> shift) & right_mask & empty
+        return moves
+
+    def flips(self, own, opp, sq):
+        """
+        Returns a bitboard of opponent discs flipped by playing at `sq`
+        (0 if the move is not legal)
+        """
+        flipped = 0
+        for ray in self.rays[sq]:
+            f = 0
+            for bit in ray:
+                if opp & bit:
+                    f |= bit
+                else:
+                    if own & bit:
+                        flipped |= f
+                    break
+        return flipped
+
+
+_geometries = {}
+
+
+def get_geometry(size):
+    # Geometry of a board size, shared by everybody using that size
+    if size not in _geometries:
+        _geometries[size] = Geometry(size)
+    return _geometries[size]
+
+
+class Position:
+    """
+    Reversi position seen from the player to move.
+    Moves are made and unmade in place; the undo stack keeps the changed and
+    flipped discs of every move, so the search never copies boards.
+    Disc counts and the number of empty squares are kept up to date on every
+    move, so evaluating a position does not scan the board.
+    """
+    __slots__ = ('own', 'opp', 'geometry', 'own_count', 'opp_count', 'n_empties', 'undo_stack')
+
+    def __init__(self, own, opp, geometry=None):
+        self.own = own
+        self.opp = opp
+        # Board size, 8x8 by default
+        self.geometry = geometry if geometry is not None else get_geometry(8)
+        self.own_count = popcount(own)
+        self.opp_count = popcount(opp)
+        self.n_empties = self.geometry.n_squares - self.own_count - self.opp_count
+        self.undo_stack = []
+
+    @classmethod
+    def from_board(cls, board, own_color, opp_color):
+        own, opp = from_board(board, own_color, opp_color)
+        return cls(own, opp, get_geometry(len(board)))
+
+    def to_board(self, own_color, opp_color, empty_color=-1):
+        return to_board(self.own, self.opp, own_color, opp_color, empty_color, self.geometry.size)
+
+    def copy(self):
+        return Position(self.own, self.opp, self.geometry)
+
+    def moves(self):
+        return self.geometry.legal_moves(self.own, self.opp)
+
+    def empties(self):
+        return self.n_empties
+
+    def make_move(self, sq):
+        """
+        Plays at `sq` for the player to move and hands the turn over.
+        Returns the flipped discs.
+        """
+        bit = 1 << sq
+        own = self.own
+        flipped = self.geometry.flips(own, self.opp, sq)
+        self.undo_stack.append((bit | flipped, flipped, self.own_count, self.opp_count))
+        self.own, self.opp = self.opp ^ flipped, own | flipped | bit
+        count = popcount(flipped)
+        self.own_count, self.opp_count = self.opp_count - count, self.own_count + count + 1
+        self.n_empties -= 1
+        return flipped
+
+    def make_pass(self):
+        self.undo_stack.append((0, 0, self.own_count, self.opp_count))
+        self.own, self.opp = self.opp, self.own
+        self.own_count, self.opp_count = self.opp_count, self.own_count
+
+    def undo_move(self):
+        """
+        Takes back the last move or pass
+        """
+        changed, flipped, self.own_count, self.opp_count = self.undo_stack.pop()
+        self.own, self.opp = self.opp ^ changed, self.own | flipped
+        if changed:
+            self.n_empties += 1
+
+
+class WeightedPosition(Position):
+    """
+    Position which also keeps the positional sums of both players
+    (weights[square] - value of a disc on the square) up to date
+    """
+    __slots__ = ('weights', 'own_value', 'opp_value', 'value_stack')
+
+    def __init__(self, own, opp, weights, geometry=None):
+        Position.__init__(self, own, opp, geometry)
+        self.weights = weights
+        self.own_value = sum(weights[sq] for sq in iter_squares(own))
+        self.opp_value = sum(weights[sq] for sq in iter_squares(opp))
+        self.value_stack = []
+
+    def copy(self):
+        return WeightedPosition(self.own, self.opp, self.weights, self.geometry)
+
+    def make_move(self, sq):
+        flipped = Position.make_move(self, sq)
+        weights = self.weights
+        self.value_stack.append((self.own_value, self.opp_value))
+        value = 0
+        rest = flipped
+        while rest:
+            low = rest & -rest
+            value += weights[low.bit_length() - 1]
+            rest ^= low
+        self.own_value, self.opp_value = self.opp_value - value, self.own_value + value + weights[sq]
+        return flipped
+
+    def make_pass(self):
+        Position.make_pass(self)
+        self.value_stack.append((self.own_value, self.opp_value))
+        self.own_value, self.opp_value = self.opp_value, self.own_value
+
+    def undo_move(self):
+        Position.undo_move(self)
+        self.own_value, self.opp_value = self.value_stack.pop()
@@ -0,0 +1,226 @@
+"""
+Exact endgame solver.
+
+Searches the rest of the game to the end and scores positions by the final
+disc difference (own discs - opponent discs, as counted by the game drivers).
+Uses negamax alpha-beta on (own, opp) bitboards with
+ - fastest-first ordering (moves leaving the opponent the fewest replies first),
+ - parity ordering (moves into board quadrants with an odd number of empty
+   squares first),
+ - a transposition table for nodes with many empty squares,
+ - dedicated routines for the last few empty squares which loop over the
+   empty squares directly instead of generating moves.
+"""
+import time
+
+from bitboard import FULL, flips, iter_squares, legal_moves, popcount
+from transposition import EXACT, LOWER, UPPER, TranspositionTable, zobrist_key
+
+# Board quadrants, used for the parity of empty squares
+QUADRANTS = (0x000000000F0F0F0F, 0x00000000F0F0F0F0,
+             0x0F0F0F0F00000000, 0xF0F0F0F000000000)
+
+CORNERS = (1 << 0) | (1 << 7) | (1 << 56) | (1 << 63)
+
+SMALL_EMPTIES = 4  # below this many empties the small routines take over
+FASTEST_FIRST_EMPTIES = 7  # mobility ordering pays off only above this
+TABLE_EMPTIES = 7  # transposition table is used from this many empties up
+
+WIN = 1
+DRAW = 0
+LOSS = -1
+
+
+class _Timeout(Exception):
+    pass
+
+
+def final_score(own, opp):
+    return popcount(own) - popcount(opp)
+
+
+def odd_quadrants(empty):
+    # Bitboard of empty squares lying in quadrants with an odd number of empties
+    odd = 0
+    for mask in QUADRANTS:
+        if popcount(empty & mask) & 1:
+            odd |= mask
+    return odd & empty
+
+
+def parity_order(empty):
+    # Empty squares, those in odd quadrants first
+    odd = odd_quadrants(empty)
+    return list(iter_squares(odd)) + list(iter_squares(empty ^ odd))
+
+
+class EndgameSolver:
+    """
+    Perfect play search of the last empty squares.
+    solve() returns None when the deadline passes before the proof is done.
+    """
+
+    def __init__(self, table_size_bits=16):
+        self.transposition_table = TranspositionTable(table_size_bits)
+        self.nodes = 0
+        self.next_check = 0  # node count at which the clock is checked again
+        self.deadline = 0
+
+    def solve(self, own, opp, deadline, alpha=-64, beta=64):
+        """
+        Returns (best square, score) for the player owning `own`, where score
+        is the final disc difference with perfect play (or a bound on it when
+        it falls outside the (alpha, beta) window), or None on timeout
+        """
+        self.deadline = deadline
+        self.next_check = self.nodes
+        self.transposition_table.new_search()
+        moves = legal_moves(own, opp)
+        if not moves:
+            return None
+        n_empties = 64 - popcount(own | opp)
+        best_sq = None
+        best = -65
+        try:
+            for sq, flipped in self.order_moves(own, opp, moves, n_empties):
+                score = -self.search(opp ^ flipped, own | flipped | (1 << sq),
+                                     -beta, -max(alpha, best), n_empties - 1)
+                if score > best:
+                    best = score
+                    best_sq = sq
+                    if best >= beta:
+                        break
+        except _Timeout:
+            return None
+        return best_sq, best
+
+    def solve_result(self, own, opp, deadline):
+        """
+        Win/loss/draw search with the null window around 0, cheaper than the
+        exact score. Returns (a move keeping the result, WIN/DRAW/LOSS) or None
+        """
+        solved = self.solve(own, opp, deadline, -1, 1)
+        if solved is None:
+            return None
+        best_sq, score = solved
+        return best_sq, (score > 0) - (score < 0)
+
+    def order_moves(self, own, opp, moves, n_empties):
+        # Returns [(square, flipped discs)] in the order to be searched
+        empty = ~(own | opp) & FULL
+        odd = odd_quadrants(empty)
+        scored = []
+        for sq in iter_squares(moves):
+            flipped = flips(own, opp, sq)
+            bit = 1 << sq
+            if n_empties > FASTEST_FIRST_EMPTIES:
+                # Fastest first: the fewer replies the opponent has, the better
+                key = popcount(legal_moves(opp ^ flipped, own | flipped | bit)) * 4
+                if bit & CORNERS:
+                    key -= 4
+            else:
+                key = 0
+            if not bit & odd:
+                key += 2
+            scored.append((key, sq, flipped))
+        scored.sort()
+        return [(sq, flipped) for _, sq, flipped in scored]
+
+    def search(self, own, opp, alpha, beta, n_empties):
+        """
+        Negamax alpha-beta (fail-soft), returns the disc difference for the player to move
+        """
+        self.nodes += 1
+        # The small routines count nodes too, so the count is compared, not masked
+        if self.nodes >= self.next_check:
+            self.next_check = self.nodes + 1024
+            if time.perf_counter() > self.deadline:
+                raise _Timeout()
+        if n_empties <= SMALL_EMPTIES:
+            return self.search_small(own, opp, alpha, beta, parity_order(~(own | opp) & FULL))
+
+        moves = legal_moves(own, opp)
+        if not moves:
+            if not legal_moves(opp, own):
+                return final_score(own, opp)
+            return -self.search(opp, own, -beta, -alpha, n_empties)
+
+        key = None
+        hash_move = None
+        if n_empties >= TABLE_EMPTIES:
+            key = zobrist_key(own, opp)
+            entry = self.transposition_table.probe(key)
+            if entry is not None:
+                _, _, bound, score, hash_move, _ = entry
+                if bound == EXACT or (bound == LOWER and score >= beta) or \
+                        (bound == UPPER and score <= alpha):
+                    return score
+
+        ordered = self.order_moves(own, opp, moves, n_empties)
+        if hash_move is not None:
+            for index, (sq, _) in enumerate(ordered):
+                if sq == hash_move:
+                    ordered.insert(0, ordered.pop(index))
+                    break
+
+        alpha_orig = alpha
+        best = -65
+        best_sq = None
+        for sq, flipped in ordered:
+            score = -self.search(opp ^ flipped, own | flipped | (1 << sq),
+                                 -beta, -alpha, n_empties - 1)
+            if score > best:
+                best = score
+                best_sq = sq
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+
+        if key is not None:
+            if best <= alpha_orig:
+                bound = UPPER
+            elif best >= beta:
+                bound = LOWER
+            else:
+                bound = EXACT
+            self.transposition_table.store(key, n_empties, bound, best, best_sq)
+        return best
+
+    def search_small(self, own, opp, alpha, beta, empties):
+        """
+        Search of the last few empty squares, given as a list in parity order
+        """
+        if len(empties) == 1:
+            return self.last_move(own, opp, empties[0])
+        self.nodes += 1
+        best = -65
+        for index, sq in enumerate(empties):
+            flipped = flips(own, opp, sq)
+            if flipped:
+                score = -self.search_small(opp ^ flipped, own | flipped | (1 << sq), -beta, -alpha,
+                                           empties[:index] + empties[index + 1:])
+                if score > best:
+                    best = score
+                    if score > alpha:
+                        alpha = score
+                        if alpha >= beta:
+                            return best
+        if best > -65:
+            return best
+        # No move: pass if the opponent can move, otherwise the game is over
+        for sq in empties:
+            if flips(opp, own, sq):
+                return -self.search_small(opp, own, -beta, -alpha, empties)
+        return final_score(own, opp)
+
+    def last_move(self, own, opp, sq):
+        # One empty square left: whoever can, plays it
+        self.nodes += 1
+        flipped = popcount(flips(own, opp, sq))
+        if flipped:
+            return popcount(own) - popcount(opp) + 2 * flipped + 1
+        flipped = popcount(flips(opp, own, sq))
+        if flipped:
+            return popcount(own) - popcount(opp) - 2 * flipped - 1
+        return popcount(own) - popcount(opp)
@@ -0,0 +1,258 @@
+"""
+Pattern-based evaluation.
+
+A position is scored by looking up the configuration of a set of board
+patterns in weight tables: the edges, the 3x3 and 2x5 corner regions and the
+diagonals of length 4 to 8, each in every position the board symmetries move
+it to. A configuration is a base-3 number (0 - empty square, 1 - disc of the
+evaluating player, 2 - disc of the other player) and is kept up to date by
+EvalPosition on every move, so evaluating a leaf is one table lookup per
+pattern.
+
+Weights are stored per game phase in int16 arrays, in 1/EVAL_SCALE discs.
+Weight file format (little endian): magic b'RVEW', version (uint32), number
+of phases (uint32), weights per phase (uint32), then the weights of phase 0,
+1, ... as int16. Without a weight file the weights are derived from a
+positional square table and the disc count (default_weights).
+"""
+import array
+import os
+import struct
+import sys
+
+from bitboard import Position, from_board
+
+MAGIC = b'RVEW'
+VERSION = 1
+HEADER = struct.Struct('<4sIII')
+
+DEFAULT_WEIGHTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'eval_weights.bin')
+
+N_PHASES = 6
+EVAL_SCALE = 64  # weight units per disc
+
+# Patterns in one orientation, as (row, col) squares from the least significant digit
+PATTERNS = (
+    ('edge', [(0, col) for col in range(8)]),
+    ('corner_3x3', [(row, col) for row in range(3) for col in range(3)]),
+    ('corner_2x5', [(row, col) for row in range(2) for col in range(5)]),
+    ('diagonal_8', [(i, i) for i in range(8)]),
+    ('diagonal_7', [(i, i + 1) for i in range(7)]),
+    ('diagonal_6', [(i, i + 2) for i in range(6)]),
+    ('diagonal_5', [(i, i + 3) for i in range(5)]),
+    ('diagonal_4', [(i, i + 4) for i in range(4)]),
+)
+
+# Value of a disc on a square in discs, used for the default weights
+SQUARE_VALUES = [
+    [10.0, -3.0, 1.0, 0.8, 0.8, 1.0, -3.0, 10.0],
+    [-3.0, -5.0, -0.45, -0.5, -0.5, -0.45, -5.0, -3.0],
+    [1.0, -0.45, 0.03, 0.01, 0.01, 0.03, -0.45, 1.0],
+    [0.8, -0.5, 0.01, 0.05, 0.05, 0.01, -0.5, 0.8],
+    [0.8, -0.5, 0.01, 0.05, 0.05, 0.01, -0.5, 0.8],
+    [1.0, -0.45, 0.03, 0.01, 0.01, 0.03, -0.45, 1.0],
+    [-3.0, -5.0, -0.45, -0.5, -0.5, -0.45, -5.0, -3.0],
+    [10.0, -3.0, 1.0, 0.8, 0.8, 1.0, -3.0, 10.0],
+]
+# Value of one disc more than the opponent per phase, for the default weights
+DISC_VALUES = (0.0, 0.0, 0.25, 0.5, 0.75, 1.0)
+
+
+def eval_phase(empties):
+    # Phase 0 - the first 10 moves, ..., phase 5 - the last 10 moves
+    return min(N_PHASES - 1, max(0, (60 - empties) // 10))
+
+
+def _symmetric_square(row, col, index):
+    # Same bits as opening_book.symmetry: flip rows, mirror columns, transpose
+    if index & 1:
+        row = 7 - row
+    if index & 2:
+        col = 7 - col
+    if index & 4:
+        row, col = col, row
+    return row, col
+
+
+def _pattern_tables():
+    """
+    Returns (table offset of every pattern kind, [(kind, squares)] of all
+    pattern instances, total number of weights per phase)
+    """
+    offsets = []
+    instances = []
+    size = 0
+    for kind, (_, cells) in enumerate(PATTERNS):
+        offsets.append(size)
+        size += 3 ** len(cells)
+        seen = set()
+        for index in range(8):
+            squares = [row * 8 + col for row, col in
+                       (_symmetric_square(row, col, index) for row, col in cells)]
+            if frozenset(squares) not in seen:
+                seen.add(frozenset(squares))
+                instances.append((kind, squares))
+    return offsets, instances, size
+
+
+TABLE_OFFSETS, INSTANCES, PHASE_SIZE = _pattern_tables()
+
+# SQUARE_INSTANCES[sq] - [(instance, 3 ** digit of sq in the instance)]
+SQUARE_INSTANCES = [[] for _ in range(64)]
+for _instance, (_, _squares) in enumerate(INSTANCES):
+    for _digit, _sq in enumerate(_squares):
+        SQUARE_INSTANCES[_sq].append((_instance, 3 ** _digit))
+
+# Index changes of playing at / flipping a square, [0] - the evaluating player
+# moves, [1] - the other player moves
+PLACE_UPDATES = ([[(instance, power) for instance, power in updates] for updates in SQUARE_INSTANCES],
+                 [[(instance, 2 * power) for instance, power in updates] for updates in SQUARE_INSTANCES])
+FLIP_UPDATES = ([[(instance, -power) for instance, power in updates] for updates in SQUARE_INSTANCES],
+                [[(instance, power) for instance, power in updates] for updates in SQUARE_INSTANCES])
+
+
+def pattern_indices(mine, theirs):
+    """
+    Weight indices (table offset included) of all pattern instances for the
+    player owning `mine`
+    """
+    indices = []
+    for kind, squares in INSTANCES:
+        index = 0
+        for digit, sq in enumerate(squares):
+            if mine >> sq & 1:
+                index += 3 ** digit
+            elif theirs >> sq & 1:
+                index += 2 * 3 ** digit
+        indices.append(TABLE_OFFSETS[kind] + index)
+    return indices
+
+
+class EvalPosition(Position):
+    """
+    Position which also keeps the pattern indices of one player (the
+    evaluating player, the player to move when it is created unless
+    `evaluating_to_move` is False) up to date
+    """
+    __slots__ = ('evaluating_to_move', 'indices', 'index_stack')
+
+    def __init__(self, own, opp, evaluating_to_move=True):
+        Position.__init__(self, own, opp)
+        self.evaluating_to_move = evaluating_to_move
+        if evaluating_to_move:
+            self.indices = pattern_indices(own, opp)
+        else:
+            self.indices = pattern_indices(opp, own)
+        self.index_stack = []
+
+    @classmethod
+    def from_board(cls, board, own_color, opp_color, evaluating_to_move=True):
+        own, opp = from_board(board, own_color, opp_color)
+        return cls(own, opp, evaluating_to_move)
+
+    def copy(self):
+        return EvalPosition(self.own, self.opp, self.evaluating_to_move)
+
+    def make_move(self, sq):
+        flipped = Position.make_move(self, sq)
+        side = 0 if self.evaluating_to_move else 1
+        self.index_stack.append(self.indices)
+        indices = self.indices = self.indices[:]
+        for instance, change in PLACE_UPDATES[side][sq]:
+            indices[instance] += change
+        flip_updates = FLIP_UPDATES[side]
+        rest = flipped
+        while rest:
+            low = rest & -rest
+            for instance, change in flip_updates[low.bit_length() - 1]:
+                indices[instance] += change
+            rest ^= low
+        self.evaluating_to_move = not self.evaluating_to_move
+        return flipped
+
+    def make_pass(self):
+        Position.make_pass(self)
+        self.index_stack.append(self.indices)
+        self.evaluating_to_move = not self.evaluating_to_move
+
+    def undo_move(self):
+        Position.undo_move(self)
+        self.indices = self.index_stack.pop()
+        self.evaluating_to_move = not self.evaluating_to_move
+
+
+def default_weights():
+    """
+    Weights of the square values and the disc difference spread over the
+    patterns covering each square
+    """
+    coverage = [len(updates) for updates in SQUARE_INSTANCES]
+    weights = []
+    for phase in range(N_PHASES):
+        phase_weights = array.array('h', bytes(2 * PHASE_SIZE))
+        for kind, (_, cells) in enumerate(PATTERNS):
+            squares = [row * 8 + col for row, col in cells]
+            # The table is built from the most significant digit down
+            table = [0.0]
+            for sq in reversed(squares):
+                value = (SQUARE_VALUES[sq // 8][sq % 8] + DISC_VALUES[phase]) * EVAL_SCALE / coverage[sq]
+                table = [total + digit_value for total in table for digit_value in (0.0, value, -value)]
+            offset = TABLE_OFFSETS[kind]
+            for index, total in enumerate(table):
+                phase_weights[offset + index] = int(round(total))
+        weights.append(phase_weights)
+    return weights
+
+
+def load_weights(path=DEFAULT_WEIGHTS_PATH):
+    """
+    Returns the weights of every phase from a weight file, or the default
+    weights when the file does not exist
+    """
+    if path is None or not os.path.exists(path):
+        return default_weights()
+    with open(path, 'rb') as weight_file:
+        magic, version, n_phases, phase_size = HEADER.unpack(weight_file.read(HEADER.size))
+        if magic != MAGIC or version != VERSION or n_phases != N_PHASES or phase_size != PHASE_SIZE:
+            raise ValueError('%s is not a weight file of version %d for these patterns' % (path, VERSION))
+        weights = []
+        for _ in range(n_phases):
+            phase_weights = array.array('h')
+            phase_weights.fromfile(weight_file, phase_size)
+            if sys.byteorder != 'little':
+                phase_weights.byteswap()
+            weights.append(phase_weights)
+    return weights
+
+
+def save_weights(path, weights):
+    with open(path, 'wb') as weight_file:
+        weight_file.write(HEADER.pack(MAGIC, VERSION, len(weights), PHASE_SIZE))
+        for phase_weights in weights:
+            phase_weights = array.array('h', phase_weights)
+            if sys.byteorder != 'little':
+                phase_weights.byteswap()
+            phase_weights.tofile(weight_file)
+
+
+class PatternEvaluator:
+    """
+    Scores EvalPositions for their evaluating player in weight units
+    (1/EVAL_SCALE discs), the full resolution of the weights
+    """
+
+    _cache = {}  # weight file path -> weights, shared by the players of a process
+
+    def __init__(self, weights):
+        self.weights = weights
+
+    @classmethod
+    def load(cls, path=DEFAULT_WEIGHTS_PATH):
+        weights = cls._cache.get(path)
+        if weights is None:
+            weights = cls._cache[path] = load_weights(path)
+        return cls(weights)
+
+    def evaluate(self, position):
+        weights = self.weights[eval_phase(position.n_empties)]
+        return sum(map(weights.__getitem__, position.indices))
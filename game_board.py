@@ -1,58 +1,131 @@
-import copy
+from bitboard import get_geometry, iter_squares, popcount
+from rays import DIRECTION_INDEX
 
 class GameBoard(object):
+    '''
+    Reversi board kept as two bit masks, one per player: position [x,y] is bit x*board_size+y.
+    The list of lists (board[x][y] is a color or empty_color) is built from the masks when
+    it is asked for and kept until the next move.
+    '''
+    __slots__ = ('board_size', 'geometry', 'p1_color', 'p2_color', 'empty_color', 'p1_mask', 'p2_mask',
+                 'view', 'legal_moves_cache')
 
     def __init__(self, board_size=8, player1_color=0, player2_color=1, empty_color=-1):
         self.board_size = board_size
+        # Move generation for the board size
+        self.geometry = get_geometry(board_size)
         self.p1_color = player1_color
         self.p2_color = player2_color
         self.empty_color = empty_color
-        self.board = self.init_board()
+        self.init_board()
 
     def clear(self):
-        self.board = self.init_board()
+        self.init_board()
 
     def init_board(self):
         '''
         Creates board and adds initial stones.
         :return: Initiated board
         '''
-        board = [self.empty_color]*self.board_size
-        for row in range(self.board_size):
-            board[row] = [self.empty_color]*self.board_size
+        half = self.board_size // 2
+        self.p1_mask = (1 << self.square(half - 1, half - 1)) | (1 << self.square(half, half))
+        self.p2_mask = (1 << self.square(half, half - 1)) | (1 << self.square(half - 1, half))
+        self.changed()
+        return self.board
+
+    def square(self, x, y):
+        # Bit of the position [x,y]
+        return x * self.board_size + y
+
+    def changed(self):
+        # Drops everything derived from the masks
+        self.view = None
+        # Legal moves per color, found on the first query
+        self.legal_moves_cache = {}
+
+    @property
+    def board(self):
+        '''
+        List of lists view of the board, do not modify it (use get_board_copy)
+        '''
+        if self.view is None:
+            size = self.board_size
+            p1_mask = self.p1_mask
+            p2_mask = self.p2_mask
+            view = []
+            bit = 1
+            for x in range(size):
+                row = []
+                for y in range(size):
+                    if p1_mask & bit:
+                        row.append(self.p1_color)
+                    elif p2_mask & bit:
+                        row.append(self.p2_color)
+                    else:
+                        row.append(self.empty_color)
+                    bit <<= 1
+                view.append(row)
+            self.view = view
+        return self.view
+
+    def snapshot(self):
+        '''
+        :return: immutable state of the board for restore()
+        '''
+        return self.p1_mask, self.p2_mask
 
-        board[self.board_size //2-1][self.board_size //2-1] = self.p1_color
-        board[self.board_size //2][self.board_size //2] = self.p1_color
-        board[self.board_size //2][self.board_size //2-1] = self.p2_color
-        board[self.board_size //2-1][self.board_size //2] = self.p2_color
+    def restore(self, snapshot):
+        self.p1_mask, self.p2_mask = snapshot
+        self.changed()
+
+    def masks(self, players_color):
+        '''
+        :return: (mask of the player, mask of the opponent)
+        '''
+        if players_color == self.p1_color:
+            return self.p1_mask, self.p2_mask
+        return self.p2_mask, self.p1_mask
 
-        return board
+    def set_masks(self, players_color, own, opp):
+        if players_color == self.p1_color:
+            self.p1_mask, self.p2_mask = own, opp
+        else:
+            self.p2_mask, self.p1_mask = own, opp
+        self.changed()
 
     def play_move(self, move, players_color):
         '''
         :param move: position where the move is made [x,y]
         :param player: player that made the move
         '''
-
-        self.board[move[0]][move[1]] = players_color
-        dx = [-1,-1,-1,0,1,1,1,0]
-        dy = [-1,0,1,1,1,0,-1,-1]
-        for i in range(len(dx)):
-            if self.confirm_direction(move,dx[i],dy[i],players_color):
-                self.change_stones_in_direction(move,dx[i],dy[i],players_color)
+        own, opp = self.masks(players_color)
+        sq = self.square(move[0], move[1])
+        flipped = self.geometry.flips(own, opp, sq)
+        self.set_masks(players_color, own | flipped | (1 << sq), opp & ~flipped)
 
     def is_correct_move(self,move,players_color):
         '''
         Check if the move is correct
         '''
-        if self.board[move[0]][move[1]] == self.empty_color:
-            dx = [-1,-1,-1,0,1,1,1,0]
-            dy = [-1,0,1,1,1,0,-1,-1]
-            for i in range(len(dx)):
-                if self.confirm_direction(move,dx[i],dy[i],players_color):
-                    return True
+        return (move[0], move[1]) in self.get_legal_moves(players_color)
 
-        return False
+    def get_legal_moves(self, players_color):
+        '''
+        :return: set of positions (x,y) where the player can move, cached until the next move
+        '''
+        moves = self.legal_moves_cache.get(players_color)
+        if moves is None:
+            moves = self.find_legal_moves(players_color)
+            self.legal_moves_cache[players_color] = moves
+        return moves
+
+    def find_legal_moves(self, players_color):
+        '''
+        Checks all empty positions at once on the bit masks
+        '''
+        own, opp = self.masks(players_color)
+        size = self.board_size
+        return frozenset(divmod(sq, size) for sq in iter_squares(self.geometry.legal_moves(own, opp)))
 
     def confirm_direction(self,move,dx,dy,players_color):
         '''
@@ -64,57 +137,47 @@ class GameBoard(object):
         :param player: player that made the move
         :return: True if move in this direction is correct
         '''
-        if players_color == self.p1_color:
-            opponents_color = self.p2_color
-        else:
-            opponents_color = self.p1_color
-
-        posx = move[0]+dx
-        posy = move[1]+dy
-        if (posx>=0) and (posx<self.board_size) and (posy>=0) and (posy<self.board_size):
-            if self.board[posx][posy] == opponents_color:
-                while (posx>=0) and (posx<self.board_size) and (posy>=0) and (posy<self.board_size):
-                    posx += dx
-                    posy += dy
-                    if (posx>=0) and (posx<self.board_size) and (posy>=0) and (posy<self.board_size):
-                        if self.board[posx][posy] == self.empty_color:
-                            return False
-                        if self.board[posx][posy] == players_color:
-                            return True
-
+        own, opp = self.masks(players_color)
+        covers_opponent = False
+        for bit in self.ray(move, dx, dy):
+            if opp & bit:
+                covers_opponent = True
+            else:
+                return covers_opponent and bool(own & bit)
         return False
 
+    def ray(self, move, dx, dy):
+        # Bits of the squares from the move to the edge in direction [dx,dy], nearest first
+        return self.geometry.rays[self.square(move[0], move[1])][DIRECTION_INDEX[(dx, dy)]]
+
+    def stones_in_direction(self,move,dx,dy,players_color):
+        '''
+        :return: mask of the opponent's stones between the move and the player's stone in direction [dx,dy]
+        '''
+        own, _ = self.masks(players_color)
+        stones = 0
+        for bit in self.ray(move, dx, dy):
+            if own & bit:
+                break
+            stones |= bit
+        return stones
+
     def change_stones_in_direction(self,move,dx,dy,players_color):
-        posx = move[0]+dx
-        posy = move[1]+dy
-        while (not(self.board[posx][posy] == players_color)):
-            self.board[posx][posy] = players_color
-            posx += dx
-            posy += dy
+        own, opp = self.masks(players_color)
+        stones = self.stones_in_direction(move, dx, dy, players_color)
+        self.set_masks(players_color, own | stones, opp & ~stones)
 
     def can_play(self, players_color):
         '''
         :return: True if there is a possible move for player
         '''
-        for x in range(self.board_size):
-            for y in range(self.board_size):
-                if self.is_correct_move([x,y], players_color):
-                    return True
-
-        return False
+        return bool(self.get_legal_moves(players_color))
 
     def get_board_copy(self):
-        return copy.deepcopy(self.board)
+        return [row[:] for row in self.board]
 
     def get_score(self):
-        stones = [0 , 0]
-        for x in range(self.board_size):
-            for y in range(self.board_size):
-                if self.board[x][y] == self.p1_color:
-                    stones[0] += 1
-                if self.board[x][y] == self.p2_color:
-                    stones[1] += 1
-        return stones
+        return [popcount(self.p1_mask), popcount(self.p2_mask)]
 
     def print_board(self):
         for x in range(self.board_size):
@@ -125,4 +188,4 @@ class GameBoard(object):
                 else:
                     row_string += ' ' + str(self.board[x][y])
             print(row_string)
-        print('')
\ No newline at end of file
+        print('')
@@ -0,0 +1,175 @@
+"""
+Search for boards of any size (6x6, 10x10, 12x12, ...).
+
+The 8x8 search of MyPlayer is built on 8x8 tables (board patterns, the
+opening book, Zobrist keys, the endgame solver). Other board sizes are
+searched by this simpler engine: negamax alpha-beta with iterative deepening
+and a transposition table, on Positions of the board's Geometry. The leaf
+evaluation is a positional square table generated for the board size, which
+the WeightedPosition keeps summed up on every move, plus the disc difference.
+Positions at the end of the game are scored by the final disc difference,
+so a search as deep as the empty squares solves the game.
+"""
+import time
+
+from bitboard import WeightedPosition, from_board, get_geometry
+from transposition import EXACT, LOWER, UPPER, TranspositionTable, ZobristKeys
+
+TERMINAL_SCALE = 10000  # one disc of a finished game outweighs any evaluation
+INFINITY = 200 * TERMINAL_SCALE  # above any score of a 12x12 board
+
+
+class GenericTimeout(Exception):
+    pass
+
+
+def square_weights(size):
+    """
+    Positional value of a disc on every square of a size x size board:
+    corners first, then walls, squares next to a corner are the worst
+    """
+    last = size - 1
+    weights = []
+    for row in range(size):
+        for col in range(size):
+            wall_row = row in (0, last)
+            wall_col = col in (0, last)
+            near_row = row in (1, last - 1)
+            near_col = col in (1, last - 1)
+            if wall_row and wall_col:
+                weight = 100  # corner
+            elif near_row and near_col:
+                weight = -50  # diagonal neighbour of a corner
+            elif (wall_row and near_col) or (wall_col and near_row):
+                weight = -20  # wall neighbour of a corner
+            elif wall_row or wall_col:
+                weight = 10
+            elif near_row or near_col:
+                weight = -5
+            else:
+                weight = 1
+            weights.append(weight)
+    return weights
+
+
+class GenericSearch:
+    """
+    Iterative deepening alpha-beta for one board size
+    """
+
+    def __init__(self, size, table_size_bits=16):
+        self.geometry = get_geometry(size)
+        self.weights = square_weights(size)
+        # Squares in the order of their positional value, the static move ordering
+        self.square_order = sorted(range(self.geometry.n_squares), key=lambda sq: -self.weights[sq])
+        self.transposition_table = TranspositionTable(table_size_bits)
+        # The masks of 10x10 and larger boards pass 64 bits, the keys are Zobrist keys of the size
+        self.zobrist = ZobristKeys(self.geometry.n_squares)
+        self.nodes = 0
+        self.deadline = 0
+        self.completed_depth = 0
+        self.solved = False  # the last move was searched to the end of the game
+        self.score = None  # score of the last move
+
+    def position(self, board, my_color, opponent_color):
+        own, opp = from_board(board, my_color, opponent_color)
+        return WeightedPosition(own, opp, self.weights, self.geometry)
+
+    def best_move(self, position, deadline):
+        """
+        Returns the best square found until `deadline` (time.perf_counter()),
+        None if there is no legal move
+        """
+        moves = position.moves()
+        if not moves:
+            return None
+        self.deadline = deadline
+        self.nodes = 0
+        self.completed_depth = 0
+        self.solved = False
+        self.transposition_table.new_search()
+        best_sq = self.order(moves, None)[0]
+        for depth in range(1, position.empties() + 1):
+            try:
+                sq, score = self.search_root(position, depth)
+            except GenericTimeout:
+                break
+            best_sq = sq
+            self.score = score
+            self.completed_depth = depth
+        self.solved = self.completed_depth == position.empties()
+        return best_sq
+
+    def order(self, moves, hash_move):
+        squares = [sq for sq in self.square_order if moves >> sq & 1]
+        if hash_move is not None and hash_move in squares:
+            squares.remove(hash_move)
+            squares.insert(0, hash_move)
+        return squares
+
+    def search_root(self, position, depth):
+        key = self.zobrist.key(position.own, position.opp)
+        entry = self.transposition_table.probe(key)
+        alpha = -INFINITY
+        best_sq = None
+        for sq in self.order(position.moves(), entry[4] if entry is not None else None):
+            position.make_move(sq)
+            score = -self.search(position, depth - 1, -INFINITY, -alpha)
+            position.undo_move()
+            if score > alpha:
+                alpha = score
+                best_sq = sq
+        self.transposition_table.store(key, depth, EXACT, alpha, best_sq)
+        return best_sq, alpha
+
+    def evaluate(self, position):
+        return position.own_value - position.opp_value + position.own_count - position.opp_count
+
+    def search(self, position, depth, alpha, beta):
+        """
+        Negamax alpha-beta (fail-hard), score for the player to move
+        """
+        self.nodes += 1
+        # Nodes of the large boards are slow, the clock is read more often than in MyPlayer
+        if not self.nodes & 255 and time.perf_counter() > self.deadline:
+            raise GenericTimeout()
+        moves = position.moves()
+        if not moves:
+            if not self.geometry.legal_moves(position.opp, position.own):
+                return (position.own_count - position.opp_count) * TERMINAL_SCALE
+            position.make_pass()
+            score = -self.search(position, depth, -beta, -alpha)
+            position.undo_move()
+            return score
+        if depth == 0:
+            return self.evaluate(position)
+
+        key = self.zobrist.key(position.own, position.opp)
+        entry = self.transposition_table.probe(key)
+        hash_move = None
+        if entry is not None:
+            _, entry_depth, bound, score, hash_move, _ = entry
+            if entry_depth >= depth and (bound == EXACT or (bound == LOWER and score >= beta) or
+                                         (bound == UPPER and score <= alpha)):
+                return score
+
+        alpha_orig = alpha
+        best_sq = None
+        for sq in self.order(moves, hash_move):
+            position.make_move(sq)
+            score = -self.search(position, depth - 1, -beta, -alpha)
+            position.undo_move()
+            if score > alpha:
+                alpha = score
+                best_sq = sq
+                if alpha >= beta:
+                    break
+
+        if alpha <= alpha_orig:
+            bound = UPPER
+        elif alpha >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.transposition_table.store(key, depth, bound, alpha, best_sq)
+        return alpha
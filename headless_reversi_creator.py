@@ -1,83 +1,203 @@
 from game_board import GameBoard
-import time, getopt, sys
+from move_timing import MoveTimer
+from player_process import MoveTimeout, PlayerProcess
+import time, getopt, sys, json
 import random_player
 import player
 
+# Verbosity levels of HeadlessReversiCreator
+QUIET = 0  # print nothing
+RESULTS = 1  # print only the final score and errors
+MOVES = 2  # print every move and the board after it
+
+
+class JsonLinesSink(object):
+    '''
+    Writes game events as JSON lines, one event per line.
+    '''
+
+    def __init__(self, path_or_file):
+        if hasattr(path_or_file, 'write'):
+            self.file = path_or_file
+            self.owns_file = False
+        else:
+            self.file = open(path_or_file, 'a')
+            self.owns_file = True
+
+    def write(self, event):
+        self.file.write(json.dumps(event, separators=(',', ':')) + '\n')
+
+    def close(self):
+        if self.owns_file:
+            self.file.close()
+        else:
+            self.file.flush()
+
 
 class HeadlessReversiCreator(object):
     '''
     Creator of the Reversi game without the GUI.
     '''
 
-    def __init__(self, player1, player1_color, player2, player2_color, board_size=8):
+    def __init__(self, player1, player1_color, player2, player2_color, board_size=8,
+                 verbosity=MOVES, event_sink=None, move_limit_ms=None):
         '''
-        :param player1: Instance of first player
+        :param player1: Instance of first player, or a PlayerProcess (e.g. PlayerProcess.from_factory)
         :param player1_color: color of player1
         :param player2: Instance of second player
         :param player1_color: color of player2
         :param boardSize: Board will have size [boardSize x boardSize]
+        :param verbosity: QUIET, RESULTS or MOVES
+        :param event_sink: object with write(event_dict), e.g. JsonLinesSink, gets an event for every ply
+        :param move_limit_ms: if given, the players that are not PlayerProcess yet run in worker processes
+                              that are killed after this many ms
         '''
+        self.verbosity = verbosity
+        self.event_sink = event_sink
         self.board = GameBoard(board_size, player1_color, player2_color)
+        if move_limit_ms is not None:
+            if not isinstance(player1, PlayerProcess):
+                player1 = PlayerProcess(player1, move_limit_ms)
+            if not isinstance(player2, PlayerProcess):
+                player2 = PlayerProcess(player2, move_limit_ms)
         self.player1 = player1
         self.player2 = player2
         self.current_player = self.player1
         self.current_player_color = player1_color
         self.player1_color = player1_color
         self.player2_color = player2_color
+        # Latency histograms per player and game phase
+        self.move_timer = MoveTimer()
 
     def play_game(self):
+        '''
+        Plays the game and closes the players that can be closed (worker
+        processes, pondering threads).
+        '''
+        try:
+            return self.run_game()
+        finally:
+            for game_player in (self.player1, self.player2):
+                if hasattr(game_player, 'close'):
+                    game_player.close()
+
+    def run_game(self):
         '''
         This function contains game loop that plays the game.
+        Nothing is formatted when verbosity is QUIET and there is no event sink.
         '''
         correct_finish = True
+        verbose = self.verbosity >= MOVES
+        sink = self.event_sink
+        ply = 0
         while self.board.can_play(self.current_player_color):
-            startTime = time.time()
-            move = self.current_player.move(self.board.get_board_copy())
-            endTime = time.time()
-            moveTime = (endTime - startTime) * 1000
+            empties = self.board.board_size ** 2 - sum(self.board.get_score())
+            startTime = time.perf_counter_ns()
+            try:
+                move = self.current_player.move(self.board.get_board_copy())
+                killed = False
+            except MoveTimeout:
+                # The worker process of the player was terminated at the time limit
+                move = None
+                killed = True
+            elapsed_ns = time.perf_counter_ns() - startTime
+            moveTime = elapsed_ns / 1e6
+            search_info = getattr(self.current_player, 'search_info', None)
+            self.move_timer.record(self.current_player_color, empties, elapsed_ns, search_info)
+            if killed:
+                if self.verbosity >= RESULTS:
+                    print('TIME LIMIT EXCEEDED: player %d killed after %.3f ms' % (self.current_player_color, moveTime))
+                if sink is not None:
+                    sink.write({'event': 'timeout', 'ply': ply, 'color': self.current_player_color,
+                                'move': None, 'time_ms': moveTime, 'killed': True})
+                return 100
             if move is None:
-                print('Player %d returns None instead of a valid move. Move takes %.3f ms.' % (self.current_player_color, moveTime))
+                if self.verbosity >= RESULTS:
+                    print('Player %d returns None instead of a valid move. Move takes %.3f ms.' % (self.current_player_color, moveTime))
+                if sink is not None:
+                    sink.write({'event': 'no_move', 'ply': ply, 'color': self.current_player_color,
+                                'time_ms': moveTime})
                 correct_finish = False
                 break
             else:
-                print('Player %d wants move [%d,%d]. Move takes %.3f ms.' % (self.current_player_color, move[0], move[1], moveTime))
+                if verbose:
+                    print('Player %d wants move [%d,%d]. Move takes %.3f ms.' % (self.current_player_color, move[0], move[1], moveTime))
                 if moveTime >= 1000:
-                    print("TIME LIMIT EXCEEDED!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
+                    if self.verbosity >= RESULTS:
+                        print("TIME LIMIT EXCEEDED!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
+                    if sink is not None:
+                        sink.write({'event': 'timeout', 'ply': ply, 'color': self.current_player_color,
+                                    'move': [int(move[0]), int(move[1])], 'time_ms': moveTime})
                     return 100
             
             move = (int(move[0]),int(move[1]))
             if self.board.is_correct_move(move, self.current_player_color):
-                print('Move is correct')
+                if verbose:
+                    print('Move is correct')
                 self.board.play_move(move, self.current_player_color)
+                if sink is not None:
+                    event = {'event': 'move', 'ply': ply, 'color': self.current_player_color,
+                             'move': list(move), 'time_ms': moveTime, 'score': self.board.get_score()}
+                    if search_info:
+                        event['nodes'] = search_info.get('nodes')
+                        event['depth'] = search_info.get('depth')
+                        event['nps'] = search_info.get('nps')
+                    sink.write(event)
+                ply += 1
 
             else:
-                print('Player %d made the wrong move [%d,%d]' % (self.current_player_color, move[0], move[1]))
+                if self.verbosity >= RESULTS:
+                    print('Player %d made the wrong move [%d,%d]' % (self.current_player_color, move[0], move[1]))
+                if sink is not None:
+                    sink.write({'event': 'wrong_move', 'ply': ply, 'color': self.current_player_color,
+                                'move': list(move), 'time_ms': moveTime})
                 correct_finish = False
                 break
 
             self.change_player()
             if not self.board.can_play(self.current_player_color):
-                print('No possible move for Player %d' % (self.current_player_color))
+                if verbose:
+                    print('No possible move for Player %d' % (self.current_player_color))
+                if sink is not None:
+                    sink.write({'event': 'pass', 'ply': ply, 'color': self.current_player_color})
                 self.change_player()
                 if self.board.can_play(self.current_player_color):
-                    print('Player %d plays again ' % (self.current_player_color))
-                else:
+                    if verbose:
+                        print('Player %d plays again ' % (self.current_player_color))
+                elif verbose:
                     print('Game over')
-            self.board.print_board()
+            if verbose:
+                self.board.print_board()
+        if verbose:
+            self.print_timing()
         if correct_finish:
-            return self.printFinalScore()
+            result = self.printFinalScore()
+            if sink is not None:
+                sink.write({'event': 'game_over', 'ply': ply, 'result': result, 'score': self.board.get_score()})
+            return result
         else:
-            print('Game over.')
-            if self.current_player_color == self.player1_color:
-                print('Winner is player %d.' % (self.player2_color))
-            else:
-                print('Winner is player %d.' % (self.player1_color))
+            if self.verbosity >= RESULTS:
+                print('Game over.')
+                if self.current_player_color == self.player1_color:
+                    print('Winner is player %d.' % (self.player2_color))
+                else:
+                    print('Winner is player %d.' % (self.player1_color))
+            if sink is not None:
+                sink.write({'event': 'game_over', 'ply': ply, 'result': None,
+                            'loser': self.current_player_color, 'score': self.board.get_score()})
+
+    def print_timing(self):
+        '''
+        Prints latency percentiles and search statistics of both players.
+        '''
+        self.move_timer.print_report(self.player1_color, getattr(self.player1, 'name', None))
+        self.move_timer.print_report(self.player2_color, getattr(self.player2, 'name', None))
 
     def count_score(self, board, color):
         # Counts the amount of cells with particular color
         score = 0
-        for y in range(8):
-            for x in range(8):
+        for y in range(len(board)):
+            for x in range(len(board)):
                 if board[y][x] == color:
                     score += 1
         return score
@@ -109,6 +229,8 @@ class HeadlessReversiCreator(object):
             ret = 1
         else:
             ret = -1
+        if self.verbosity < RESULTS:
+            return ret
         print('\n\n-----------------------------\n')
         print('Final score:\n\nPlayer%d:Player%d\n\t[%d:%d]\n' % (self.player1_color, self.player2_color, p1Stones, p2Stones))
         if p1Stones > p2Stones:
@@ -122,9 +244,17 @@ class HeadlessReversiCreator(object):
 
 
 if __name__ == "__main__":
-    (choices, args) = getopt.getopt(sys.argv[1:], "")
+    (choices, args) = getopt.getopt(sys.argv[1:], "v:l:s:t:")
     p1_color = 0
     p2_color = 1
+    # -v 0/1/2 - verbosity (QUIET, RESULTS, MOVES), -l file - append game events as JSON lines,
+    # -s board size (default 8; 6, 10, 12, ...),
+    # -t ms - players run in worker processes killed after this time (default 1000, 0 - in this process)
+    options = dict(choices)
+    board_size = int(options.get('-s', 8))
+    move_limit_ms = int(options.get('-t', 1000)) or None
+    verbosity = int(options.get('-v', MOVES))
+    sink = JsonLinesSink(options['-l']) if '-l' in options else None
 
     if len(args) == 0:
         print('No arguments given.\nRunning game with two random players.')
@@ -132,6 +262,7 @@ if __name__ == "__main__":
         win0 = 0
         win1 = 0
         idx = 1
+        timer = MoveTimer()
         # choose players
         for idx in range(65):
             # p1 = AB4TCB_diff.MyPlayer(p1_color, p2_color)
@@ -152,8 +283,9 @@ if __name__ == "__main__":
             # p2 = dev_player.MyPlayer(p2_color, p1_color)
             # p2 = random_player.MyPlayer(p2_color, p1_color)
 
-            game = HeadlessReversiCreator(p1, p1_color, p2, p2_color, 8)
+            game = HeadlessReversiCreator(p1, p1_color, p2, p2_color, board_size, verbosity, sink, move_limit_ms)
             result = game.play_game()
+            timer.merge(game.move_timer)
             if result == 100:
                 print("Time error occured at the %d game!" % idx)
                 break
@@ -165,6 +297,8 @@ if __name__ == "__main__":
         print("I won", win1, "games")
         print("I lost", win0, "games")
         print("Draws:", idx - win1 - win0, "games")
+        timer.print_report(p1_color, p1.name)
+        timer.print_report(p2_color, p2.name)
 
     elif len(args) == 1:
         print('One player given in argument.\nRunning game with given player against the random player.')
@@ -176,7 +310,7 @@ if __name__ == "__main__":
             player_module = __import__(to_import)
             p2 = player_module.MyPlayer(p2_color, p1_color)
 
-            game = HeadlessReversiCreator(p1, p1_color, p2, p2_color, 8)
+            game = HeadlessReversiCreator(p1, p1_color, p2, p2_color, board_size, verbosity, sink, move_limit_ms)
             game.play_game()
 
         except ImportError:
@@ -208,6 +342,8 @@ if __name__ == "__main__":
             print('Error: Cannot import given player: %s.' %(args[1]))
 
         if importsCorrect:
-            game = HeadlessReversiCreator(p1, p1_color, p2, p2_color, 8)
+            game = HeadlessReversiCreator(p1, p1_color, p2, p2_color, board_size, verbosity, sink, move_limit_ms)
             game.play_game()
 
+    if sink is not None:
+        sink.close()
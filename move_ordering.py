@@ -0,0 +1,88 @@
+"""
+Move ordering for the alpha-beta search.
+
+The earlier the best move of a node is searched, the sooner alpha-beta can
+cut the node off. MoveOrderer sorts the moves of a node by
+ 1. the best move stored in the transposition table (hash move),
+ 2. the killer moves of the same ply (moves which caused a cutoff in a
+    sibling node),
+ 3. the mobility left to the opponent after the move (near the root only,
+    where it pays for its cost),
+ 4. the history table (how often and how deep a square caused cutoffs),
+ 5. a static square ranking (corners and walls first).
+It also counts cutoffs by the index of the move causing them.
+"""
+from bitboard import flips, iter_squares, legal_moves, popcount
+
+HASH_MOVE_KEY = 1 << 62
+KILLER_KEYS = (1 << 61, 1 << 60)
+MOBILITY_WEIGHT = 1 << 40  # one reply less outweighs any history score
+MAX_PLY = 64
+MOBILITY_DEPTH = 5  # mobility ordering is used from this remaining depth up
+CUTOFF_INDEXES = 8  # cutoffs at this index or later are counted together
+
+
+class MoveOrderer:
+    """
+    Orders moves of both players of the search (side 0 - the player to move
+    at the root, side 1 - the opponent) and learns from cutoffs
+    """
+
+    def __init__(self, static_rank=None):
+        # static_rank[square] - lower is searched first
+        self.static_rank = static_rank if static_rank is not None else [0] * 64
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = [[0] * 64, [0] * 64]
+        self.cutoffs = [0] * CUTOFF_INDEXES
+
+    def new_search(self):
+        # Killers belong to one search, history is only aged
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        for table in self.history:
+            for sq in range(64):
+                table[sq] >>= 1
+
+    def order(self, own, opp, moves, hash_move, ply, side, depth):
+        """
+        Returns the squares of the `moves` bitboard in the order to be searched
+        """
+        killers = self.killers[ply]
+        history = self.history[side]
+        static_rank = self.static_rank
+        use_mobility = depth >= MOBILITY_DEPTH
+        scored = []
+        for sq in iter_squares(moves):
+            if sq == hash_move:
+                key = HASH_MOVE_KEY
+            elif sq == killers[0]:
+                key = KILLER_KEYS[0]
+            elif sq == killers[1]:
+                key = KILLER_KEYS[1]
+            else:
+                key = (history[sq] << 6) - static_rank[sq]
+                if use_mobility:
+                    flipped = flips(own, opp, sq)
+                    replies = legal_moves(opp ^ flipped, own | flipped | (1 << sq))
+                    key -= popcount(replies) * MOBILITY_WEIGHT
+            scored.append((key, sq))
+        scored.sort(reverse=True)
+        return [sq for _, sq in scored]
+
+    def record_cutoff(self, sq, index, ply, side, depth):
+        """
+        `sq`, searched as move number `index` of its node, caused a cutoff
+        """
+        self.cutoffs[min(index, CUTOFF_INDEXES - 1)] += 1
+        killers = self.killers[ply]
+        if killers[0] != sq:
+            killers[1] = killers[0]
+            killers[0] = sq
+        self.history[side][sq] += depth * depth
+
+    def first_move_cutoff_rate(self):
+        # Share of cutoffs caused by the first searched move
+        total = sum(self.cutoffs)
+        return self.cutoffs[0] / total if total else 0.0
+
+    def reset_counters(self):
+        self.cutoffs = [0] * CUTOFF_INDEXES
@@ -0,0 +1,166 @@
+"""
+Move latency statistics for the game drivers.
+
+MoveTimer records the duration of every move (measured with
+time.perf_counter_ns) together with the search info a player exposes in its
+`search_info` attribute (nodes, depth, nodes per second), and aggregates
+them per player color and game phase into latency histograms.
+"""
+
+OPENING = 'opening'
+MIDGAME = 'midgame'
+ENDGAME = 'endgame'
+PHASES = (OPENING, MIDGAME, ENDGAME)
+
+# Upper edges of the histogram buckets in ms, the last bucket is open
+BUCKET_EDGES_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 800, 1000)
+
+
+def phase_of(empties):
+    # Game phase by the number of empty squares (of 60 on the 8x8 board)
+    if empties > 44:
+        return OPENING
+    if empties > 16:
+        return MIDGAME
+    return ENDGAME
+
+
+class LatencyHistogram:
+    """
+    Move durations in ns with percentiles and fixed histogram buckets
+    """
+
+    def __init__(self):
+        self.samples = []
+        self.is_sorted = True
+
+    def __len__(self):
+        return len(self.samples)
+
+    def add(self, elapsed_ns):
+        self.samples.append(elapsed_ns)
+        self.is_sorted = False
+
+    def merge(self, other):
+        self.samples.extend(other.samples)
+        self.is_sorted = False
+
+    def percentile(self, q):
+        # Nearest-rank percentile in ns, 0 without samples
+        if not self.samples:
+            return 0
+        if not self.is_sorted:
+            self.samples.sort()
+            self.is_sorted = True
+        index = int(round(q / 100.0 * len(self.samples))) - 1
+        return self.samples[max(0, min(len(self.samples) - 1, index))]
+
+    def buckets(self):
+        # Number of samples per BUCKET_EDGES_MS bucket, plus the open last one
+        counts = [0] * (len(BUCKET_EDGES_MS) + 1)
+        for elapsed_ns in self.samples:
+            elapsed_ms = elapsed_ns / 1e6
+            index = 0
+            while index < len(BUCKET_EDGES_MS) and elapsed_ms > BUCKET_EDGES_MS[index]:
+                index += 1
+            counts[index] += 1
+        return counts
+
+    def summary_ms(self):
+        count = len(self.samples)
+        return {
+            'moves': count,
+            'mean': sum(self.samples) / count / 1e6 if count else 0.0,
+            'p50': self.percentile(50) / 1e6,
+            'p95': self.percentile(95) / 1e6,
+            'p99': self.percentile(99) / 1e6,
+            'max': self.percentile(100) / 1e6,
+        }
+
+
+class MoveTimer:
+    """
+    Latency histograms and search statistics per player color and game phase
+    """
+
+    def __init__(self):
+        self.histograms = {}  # (color, phase) -> LatencyHistogram
+        self.nodes = {}  # (color, phase) -> searched nodes
+        self.depths = {}  # (color, phase) -> sum of reached depths
+        self.searches = {}  # (color, phase) -> moves with search info
+        self.search_ns = {}  # (color, phase) -> duration of the moves with search info
+
+    def record(self, color, empties, elapsed_ns, search_info=None):
+        key = (color, phase_of(empties))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = LatencyHistogram()
+        histogram.add(elapsed_ns)
+        if search_info:
+            self.nodes[key] = self.nodes.get(key, 0) + search_info.get('nodes', 0)
+            self.depths[key] = self.depths.get(key, 0) + search_info.get('depth', 0)
+            self.searches[key] = self.searches.get(key, 0) + 1
+            self.search_ns[key] = self.search_ns.get(key, 0) + elapsed_ns
+
+    def merge(self, other, colors=None):
+        """
+        Adds the moves of another MoveTimer, `colors` ({its color: color
+        here}) files them under other colors, e.g. per player of a tournament
+        """
+        def renamed(key):
+            return key if colors is None else (colors[key[0]], key[1])
+
+        for key, histogram in other.histograms.items():
+            key = renamed(key)
+            if key not in self.histograms:
+                self.histograms[key] = LatencyHistogram()
+            self.histograms[key].merge(histogram)
+        for mine, theirs in ((self.nodes, other.nodes), (self.depths, other.depths),
+                             (self.searches, other.searches), (self.search_ns, other.search_ns)):
+            for key, value in theirs.items():
+                key = renamed(key)
+                mine[key] = mine.get(key, 0) + value
+
+    def histogram(self, color, phase=None):
+        # Histogram of one phase, or of the whole game when phase is None
+        if phase is not None:
+            return self.histograms.get((color, phase), LatencyHistogram())
+        merged = LatencyHistogram()
+        for key, histogram in self.histograms.items():
+            if key[0] == color:
+                merged.merge(histogram)
+        return merged
+
+    def report(self, color):
+        """
+        Latency summary in ms, nodes, mean depth and nodes/second of one
+        player for every phase and for the whole game ('all')
+        """
+        report = {}
+        for phase in PHASES + ('all',):
+            keys = [(color, phase)] if phase != 'all' else [(color, p) for p in PHASES]
+            histogram = self.histogram(color, None if phase == 'all' else phase)
+            entry = histogram.summary_ms()
+            searches = sum(self.searches.get(key, 0) for key in keys)
+            if searches:
+                nodes = sum(self.nodes.get(key, 0) for key in keys)
+                entry['nodes'] = nodes
+                entry['mean_depth'] = sum(self.depths.get(key, 0) for key in keys) / searches
+                seconds = sum(self.search_ns.get(key, 0) for key in keys) / 1e9
+                entry['nps'] = nodes / seconds if seconds else 0.0
+            report[phase] = entry
+        return report
+
+    def print_report(self, color, name=None):
+        print('Move latency of %s [ms]:' % (name if name is not None else 'player %d' % color))
+        for phase, entry in self.report(color).items():
+            if not entry['moves']:
+                continue
+            line = '  %-8s %3d moves  p50 %8.2f  p95 %8.2f  p99 %8.2f  max %8.2f' % (
+                phase, entry['moves'], entry['p50'], entry['p95'], entry['p99'], entry['max'])
+            if 'nodes' in entry:
+                line += '  depth %5.1f  %9.0f nodes/s' % (entry['mean_depth'], entry['nps'])
+            print(line)
+        counts = self.histogram(color).buckets()
+        labels = ['<=%d' % edge for edge in BUCKET_EDGES_MS] + ['>%d' % BUCKET_EDGES_MS[-1]]
+        print('  histogram: ' + ' '.join('%s:%d' % (label, count) for label, count in zip(labels, counts) if count))
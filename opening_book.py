@@ -0,0 +1,195 @@
+"""
+Opening book for MyPlayer.
+
+The book maps positions of the first plies of the game to the move found by
+a deep search made offline. Positions are stored in a canonical orientation:
+of the 8 symmetric variants of a position (rotations and reflections of the
+board) the one with the smallest (own, opp) bitboards, so one record serves
+all of them.
+
+The book is a position database (see position_db.py) keyed by the hash of
+the canonical position, the value is the best square in the canonical
+orientation (1 byte).
+
+Generating the book:
+
+>> python opening_book.py -p 8 -t 3000 -w 8 -o opening_book.bin
+
+-p  number of plies from the initial position covered by the book
+-t  search time per position in ms
+-w  number of worker processes (default: number of CPU cores)
+-o  output file (default: opening_book.bin next to this file)
+"""
+import getopt
+import multiprocessing
+import os
+import sys
+
+from bitboard import FULL, flips, iter_squares, legal_moves, to_board
+from position_db import PositionDatabase, position_key, write_database
+
+DEFAULT_BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'opening_book.bin')
+
+# Initial position of GameBoard.init_board, the first player to move
+START_OWN = (1 << 27) | (1 << 36)
+START_OPP = (1 << 28) | (1 << 35)
+
+
+def flip_vertical(bb):
+    # Row r -> row 7 - r
+    bb = ((bb >> 8) & 0x00FF00FF00FF00FF) | ((bb & 0x00FF00FF00FF00FF) << 8)
+    bb = ((bb >> 16) & 0x0000FFFF0000FFFF) | ((bb & 0x0000FFFF0000FFFF) << 16)
+    return (bb >> 32) | ((bb << 32) & FULL)
+
+
+def mirror_horizontal(bb):
+    # Column c -> column 7 - c
+    bb = ((bb >> 1) & 0x5555555555555555) | ((bb & 0x5555555555555555) << 1)
+    bb = ((bb >> 2) & 0x3333333333333333) | ((bb & 0x3333333333333333) << 2)
+    return ((bb >> 4) & 0x0F0F0F0F0F0F0F0F) | ((bb & 0x0F0F0F0F0F0F0F0F) << 4)
+
+
+def transpose(bb):
+    # [row, col] -> [col, row]
+    t = 0x0F0F0F0F00000000 & (bb ^ (bb << 28))
+    bb ^= t ^ (t >> 28)
+    t = 0x3333000033330000 & (bb ^ (bb << 14))
+    bb ^= t ^ (t >> 14)
+    t = 0x5500550055005500 & (bb ^ (bb << 7))
+    bb ^= t ^ (t >> 7)
+    return bb
+
+
+def symmetry(bb, index):
+    """
+    Applies one of the 8 board symmetries: bit 0 of `index` flips rows,
+    bit 1 mirrors columns, bit 2 transposes (after the other two)
+    """
+    if index & 1:
+        bb = flip_vertical(bb)
+    if index & 2:
+        bb = mirror_horizontal(bb)
+    if index & 4:
+        bb = transpose(bb)
+    return bb
+
+
+# SYMMETRY_SQUARES[index][sq] - where square sq goes under symmetry index,
+# INVERSE_SQUARES[index][sq] - where it comes from
+SYMMETRY_SQUARES = [[symmetry(1 << sq, index).bit_length() - 1 for sq in range(64)]
+                    for index in range(8)]
+INVERSE_SQUARES = [[0] * 64 for _ in range(8)]
+for _index in range(8):
+    for _sq in range(64):
+        INVERSE_SQUARES[_index][SYMMETRY_SQUARES[_index][_sq]] = _sq
+
+
+def canonical(own, opp):
+    """
+    Returns (own, opp, symmetry index) of the canonical variant of the position
+    """
+    best = (own, opp, 0)
+    for index in range(1, 8):
+        variant = (symmetry(own, index), symmetry(opp, index), index)
+        if variant < best:
+            best = variant
+    return best
+
+
+class OpeningBook:
+    """
+    Position -> best move lookups in the memory-mapped book file
+    """
+
+    def __init__(self, path=DEFAULT_BOOK_PATH):
+        self.database = PositionDatabase(path)
+
+    def __len__(self):
+        return len(self.database)
+
+    def close(self):
+        self.database.close()
+
+    def lookup(self, own, opp):
+        """
+        Returns the book square for the player owning `own`, or None
+        """
+        canonical_own, canonical_opp, index = canonical(own, opp)
+        value = self.database.lookup(position_key(canonical_own, canonical_opp))
+        if value is None:
+            return None
+        return INVERSE_SQUARES[index][value[0]]
+
+
+def save_book(path, moves):
+    """
+    Writes {(canonical own, canonical opp): canonical square} to a book file
+    """
+    write_database(path, {position_key(own, opp): bytes((sq,)) for (own, opp), sq in moves.items()}, 1)
+
+
+def _search_position(task):
+    # Best square of a canonical position found by MyPlayer within the time limit
+    own, opp, time_limit_ms = task
+    import player  # player imports this module
+    searcher = player.MyPlayer(0, 1, time_limit_ms=time_limit_ms, book_path=None)
+    row, col = searcher.move(to_board(own, opp, 0, 1))
+    return (own, opp), row * 8 + col
+
+
+def _children(own, opp):
+    # Canonical positions after every legal move (after a pass if there is none)
+    moves = legal_moves(own, opp)
+    if not moves:
+        return {canonical(opp, own)[:2]} if legal_moves(opp, own) else set()
+    children = set()
+    for sq in iter_squares(moves):
+        flipped = flips(own, opp, sq)
+        children.add(canonical(opp ^ flipped, own | flipped | (1 << sq))[:2])
+    return children
+
+
+def generate_book(plies, time_limit_ms, workers=None):
+    """
+    Searches positions of the first `plies` plies. Where the book player is
+    to move only its book move is followed, where the opponent is to move
+    all replies are, once for each color of the book player.
+    Returns {(canonical own, canonical opp): canonical square}
+    """
+    moves = {}
+    with multiprocessing.Pool(workers) as pool:
+        for first_player_is_book in (True, False):
+            level = {canonical(START_OWN, START_OPP)[:2]}
+            for ply in range(plies):
+                if (ply % 2 == 0) == first_player_is_book:
+                    tasks = [(own, opp, time_limit_ms) for own, opp in level
+                             if (own, opp) not in moves and legal_moves(own, opp)]
+                    moves.update(pool.map(_search_position, tasks))
+                    next_level = set()
+                    for own, opp in level:
+                        sq = moves.get((own, opp))
+                        if sq is not None:
+                            flipped = flips(own, opp, sq)
+                            next_level.add(canonical(opp ^ flipped, own | flipped | (1 << sq))[:2])
+                        else:
+                            next_level |= _children(own, opp)
+                else:
+                    next_level = set()
+                    for own, opp in level:
+                        next_level |= _children(own, opp)
+                level = next_level
+                print('ply %d: %d positions, %d in the book' % (ply + 1, len(level), len(moves)))
+    return moves
+
+
+if __name__ == "__main__":
+    (choices, args) = getopt.getopt(sys.argv[1:], "p:t:w:o:")
+    options = dict(choices)
+    plies = int(options.get('-p', 8))
+    time_limit_ms = int(options.get('-t', 3000))
+    workers = int(options['-w']) if '-w' in options else None
+    path = options.get('-o', DEFAULT_BOOK_PATH)
+
+    book_moves = generate_book(plies, time_limit_ms, workers)
+    save_book(path, book_moves)
+    print('%d positions written to %s' % (len(book_moves), path))
@@ -0,0 +1,115 @@
+"""
+Parallel root search for MyPlayer.
+
+The root moves of one iteration are searched by a pool of worker processes.
+Every worker keeps its own MyPlayer (and transposition table) for the whole
+game. The workers share the best root score found so far through one shared
+integer, so a root move started later is searched with a tighter window.
+Every search has an id, the workers skip the tasks of an abandoned search
+and never write its scores over the shared alpha of the next one.
+"""
+import multiprocessing
+import time
+
+from evaluation import EvalPosition
+
+_player = None  # MyPlayer searching inside a worker process
+_search_timeout = None
+_score_bound = None
+_shared_alpha = None
+_shared_search = None
+ABANDONED = 0  # search id while no search runs
+
+# The workers stop this long before the deadline of the move, so their scores
+# are back in the main process by the deadline
+RESULT_MARGIN = 0.05
+
+
+def _init_worker(my_color, opponent_color, player_options, shared_alpha, shared_search):
+    global _player, _search_timeout, _score_bound, _shared_alpha, _shared_search
+    import player  # player imports this module, so it is imported here
+    _player = player.MyPlayer(my_color, opponent_color, **player_options)
+    _search_timeout = player.SearchTimeout
+    _score_bound = player.SCORE_BOUND
+    _shared_alpha = shared_alpha
+    _shared_search = shared_search
+
+
+def _search_move(task):
+    # Returns the score of one root move (with its preev_board value added),
+    # or None when the search only proved it is not better than the shared
+    # alpha, or False when the deadline passes or the search was abandoned
+    sq, own, opp, depth, value, generation, search_id, wall_deadline = task
+    if _shared_search.value != search_id or time.time() > wall_deadline:
+        return False
+    _player.deadline = time.perf_counter() + wall_deadline - time.time()
+    _player.depth = depth + 1  # the iteration depth, counted from the root
+    _player.transposition_table.generation = generation
+    alpha = _shared_alpha.value
+    try:
+        position = EvalPosition(own, opp, evaluating_to_move=False)
+        score = _player.minimax(position, depth, alpha - value, _score_bound - value, my_turn=False)
+    except _search_timeout:
+        return False
+    score += value
+    if score <= alpha:
+        return None
+    with _shared_alpha.get_lock():
+        if _shared_search.value == search_id and score > _shared_alpha.value:
+            _shared_alpha.value = score
+    return score
+
+
+class RootSplitter:
+    """
+    Pool of worker processes searching root moves for one player.
+    `player_options` are the keyword arguments of the MyPlayer of every
+    worker (weights, endgame size, ...), the same as the player's own
+    """
+
+    def __init__(self, my_color, opponent_color, workers, **player_options):
+        self.shared_alpha = multiprocessing.Value('i', 0)  # the root bound, set by every search
+        # Id of the running search, ABANDONED when there is none
+        self.shared_search = multiprocessing.Value('i', ABANDONED, lock=False)
+        self.search_id = 0
+        self.pool = multiprocessing.Pool(workers, _init_worker,
+                                         (my_color, opponent_color, player_options, self.shared_alpha,
+                                          self.shared_search))
+
+    def search(self, tasks, alpha, generation, deadline):
+        """
+        Searches root moves given as (square, own, opp, depth, preev value)
+        of the position after the move, starting with the root bound `alpha`.
+        Returns their scores (None for moves proven not to be better than
+        another move), or None if they are not all done by `deadline`
+        (time.perf_counter() of this process)
+        """
+        self.search_id += 1
+        with self.shared_alpha.get_lock():
+            self.shared_alpha.value = alpha
+            self.shared_search.value = self.search_id
+        # perf_counter is not comparable between processes, the wall clock is
+        wall_deadline = time.time() + deadline - RESULT_MARGIN - time.perf_counter()
+        results = [self.pool.apply_async(_search_move, (task + (generation, self.search_id, wall_deadline),))
+                   for task in tasks]
+        scores = []
+        for result in results:
+            try:
+                score = result.get(max(0.0, deadline - time.perf_counter()))
+            except multiprocessing.TimeoutError:
+                score = False
+            if score is False:
+                # The queued tasks of this search return right away, their results are dropped
+                self.abandon()
+                return None
+            scores.append(score)
+        self.abandon()
+        return scores
+
+    def abandon(self):
+        with self.shared_alpha.get_lock():
+            self.shared_search.value = ABANDONED
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
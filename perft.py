@@ -0,0 +1,307 @@
+"""
+Perft: counts the positions reached from the start to a fixed depth.
+
+Every move generator of the repo walks the same tree from
+GameBoard.init_board (color 0 to move) and the leaf counts must agree; a
+difference means one of them finds or plays moves wrongly. A player without
+a move passes, which counts as a ply, and a finished game is a leaf at
+whatever depth it ends. Up to depth 9 no game has ended yet, so the counts are
+the published ones (4, 12, 56, 244, 1396, 8200, 55092, 390216, 3005288).
+
+Generators:
+    game_board      GameBoard.get_legal_moves / play_move / snapshot+restore
+    find_moves      player.MyPlayer.find_moves + repaint_the_board on lists
+    midgame_moves   player.MyPlayer.find_midgame_moves (is_move_valid) + repaint_the_board
+    bitboard        bitboard.Position moves / make_move / make_pass / undo_move
+    batch           batch_moves.expand, a whole ply at once (needs NumPy)
+
+>> python perft.py -d 7
+>> python perft.py -d 9 -g bitboard,batch
+>> python perft.py -d 5 -c
+
+-d  depth (default 6)
+-g  comma separated generators (default all)
+-v  divide: also prints the count below every first move
+-c  starts from the positions of the benchmark corpus and PASS_POSITIONS
+    instead of the start, the latter reach passes and finished games
+"""
+import getopt
+import sys
+import time
+
+from bitboard import Position, iter_squares, legal_moves
+from game_board import GameBoard
+import player
+
+KNOWN = (1, 4, 12, 56, 244, 1396, 8200, 55092, 390216, 3005288)
+GENERATORS = ('game_board', 'find_moves', 'midgame_moves', 'bitboard', 'batch')
+LIST_GENERATORS = ('find_moves', 'midgame_moves')  # need a MyPlayer
+# Late positions (from random games, the player to move has discs 'own') whose
+# trees hold passes and finished games within a few plies
+PASS_POSITIONS = (
+    (0xC0FEDDFB770B823E, 0x3E01220488742C00),
+    (0xC68DDFDC0C158900, 0x3832202373EA363E),
+    (0x070F37132CFCF81C, 0x18F0C8ECD3030642),
+    (0x7C0094CCDD110100, 0x02FF6932226EDEFE),
+)
+FIRST_COLOR = 0
+SECOND_COLOR = 1
+
+
+def start_position():
+    # (own, opp) of FIRST_COLOR at the start of the game
+    game_board = GameBoard()
+    game_board.init_board()
+    return game_board.masks(FIRST_COLOR)
+
+
+def start_board(own, opp):
+    # GameBoard of the position, FIRST_COLOR to move
+    game_board = GameBoard()
+    game_board.set_masks(FIRST_COLOR, own, opp)
+    return game_board
+
+
+def game_board_perft(game_board, color, depth):
+    if depth == 0:
+        return 1
+    moves = game_board.get_legal_moves(color)
+    if not moves:
+        if not game_board.can_play(1 - color):
+            return 1
+        return game_board_perft(game_board, 1 - color, depth - 1)
+    snapshot = game_board.snapshot()
+    total = 0
+    for move in moves:
+        game_board.play_move(move, color)
+        total += game_board_perft(game_board, 1 - color, depth - 1)
+        game_board.restore(snapshot)
+    return total
+
+
+def game_board_divide(own, opp, depth):
+    game_board = start_board(own, opp)
+    snapshot = game_board.snapshot()
+    counts = {}
+    for move in game_board.get_legal_moves(FIRST_COLOR):
+        game_board.play_move(move, FIRST_COLOR)
+        counts[tuple(move)] = game_board_perft(game_board, SECOND_COLOR, depth - 1)
+        game_board.restore(snapshot)
+    return counts
+
+
+def list_perft(find, repaint, board, color, depth):
+    """
+    Perft on list of lists boards: find(board, color) gives the moves [row, col]
+    of `color`, repaint(board, row, col, color) plays one
+    """
+    if depth == 0:
+        return 1
+    moves = find(board, color)
+    if not moves:
+        if not find(board, 1 - color):
+            return 1
+        return list_perft(find, repaint, board, 1 - color, depth - 1)
+    total = 0
+    for row, col in moves:
+        child = [line[:] for line in board]
+        repaint(child, row, col, color)
+        total += list_perft(find, repaint, child, 1 - color, depth - 1)
+    return total
+
+
+def new_searcher():
+    # Built outside the timing, the default weights take a while to load
+    return player.MyPlayer(FIRST_COLOR, SECOND_COLOR, book_path=None)
+
+
+def player_generator(name, searcher):
+    # (find, repaint) of MyPlayer, my_turn is True when FIRST_COLOR moves
+    def repaint(board, row, col, color):
+        searcher.repaint_the_board(board, row, col, color == FIRST_COLOR)
+
+    if name == 'find_moves':
+        def find(board, color):
+            return searcher.find_moves(board, color, 1 - color)
+    else:
+        def find(board, color):
+            return searcher.find_midgame_moves(board, color == FIRST_COLOR)
+    return find, repaint
+
+
+def list_divide(name, own, opp, depth, searcher):
+    find, repaint = player_generator(name, searcher)
+    board = start_board(own, opp).get_board_copy()
+    counts = {}
+    for row, col in find(board, FIRST_COLOR):
+        child = [line[:] for line in board]
+        repaint(child, row, col, FIRST_COLOR)
+        counts[(row, col)] = list_perft(find, repaint, child, SECOND_COLOR, depth - 1)
+    return counts
+
+
+def bitboard_perft(position, depth):
+    if depth == 0:
+        return 1
+    moves = position.moves()
+    if not moves:
+        if not legal_moves(position.opp, position.own):
+            return 1
+        position.make_pass()
+        total = bitboard_perft(position, depth - 1)
+        position.undo_move()
+        return total
+    total = 0
+    for sq in iter_squares(moves):
+        position.make_move(sq)
+        total += bitboard_perft(position, depth - 1)
+        position.undo_move()
+    return total
+
+
+def bitboard_divide(own, opp, depth):
+    position = Position(own, opp)
+    counts = {}
+    for sq in iter_squares(position.moves()):
+        position.make_move(sq)
+        counts[divmod(sq, 8)] = bitboard_perft(position, depth - 1)
+        position.undo_move()
+    return counts
+
+
+def batch_perft(positions, depth):
+    """
+    Breadth first: expands all positions of a ply at once. `positions` is an
+    (N, 2) uint64 array, the memory grows with the count of the last ply
+    """
+    import numpy as np
+    from batch_moves import expand, legal_moves as batch_legal_moves
+
+    finished = 0
+    for _ in range(depth):
+        if not len(positions):
+            break
+        own, opp = positions[:, 0], positions[:, 1]
+        stuck = batch_legal_moves(own, opp) == 0
+        _, _, children = expand(own, opp)
+        # Without a move the player passes, or the game is over when the opponent cannot move either
+        can_pass = stuck & (batch_legal_moves(opp, own) != 0)
+        finished += int(np.count_nonzero(stuck & ~can_pass))
+        passed = positions[can_pass][:, ::-1]
+        positions = np.concatenate([children, passed]) if len(passed) else children
+    return finished + len(positions)
+
+
+def batch_divide(own, opp, depth):
+    import numpy as np
+
+    position = Position(own, opp)
+    counts = {}
+    for sq in iter_squares(position.moves()):
+        position.make_move(sq)
+        start = np.array([[position.own, position.opp]], dtype=np.uint64)
+        counts[divmod(sq, 8)] = batch_perft(start, depth - 1)
+        position.undo_move()
+    return counts
+
+
+def divide(name, own, opp, depth, searcher=None):
+    """
+    {first move (row, col): leaf count below it} of the generator from the
+    position (own, opp), FIRST_COLOR to move and at least one move. The list
+    generators use `searcher` (new_searcher() when not given)
+    """
+    if name == 'game_board':
+        return game_board_divide(own, opp, depth)
+    if name in LIST_GENERATORS:
+        return list_divide(name, own, opp, depth, searcher or new_searcher())
+    if name == 'bitboard':
+        return bitboard_divide(own, opp, depth)
+    if name == 'batch':
+        return batch_divide(own, opp, depth)
+    raise ValueError('unknown generator %s' % name)
+
+
+def available(names):
+    # The generators whose dependencies are installed
+    if 'batch' in names:
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            print('batch skipped, NumPy is not installed')
+            names = [name for name in names if name != 'batch']
+    return names
+
+
+def run_perft(names, own, opp, depth, show_divide=False):
+    """
+    Runs every generator to `depth` from (own, opp), prints counts and nodes
+    per second. Returns {generator: {first move: count}}
+    """
+    results = {}
+    searcher = new_searcher() if set(names) & set(LIST_GENERATORS) else None
+    for name in names:
+        start = time.perf_counter()
+        counts = divide(name, own, opp, depth, searcher)
+        elapsed = time.perf_counter() - start
+        total = sum(counts.values())
+        results[name] = counts
+        print('%-14s perft(%d) = %12d %9.3f s %12.0f nodes/s' % (
+            name, depth, total, elapsed, total / elapsed if elapsed else 0.0))
+    if show_divide:
+        moves = sorted({move for counts in results.values() for move in counts})
+        print('\n%-8s' % 'move' + ''.join('%15s' % name for name in results))
+        for move in moves:
+            print('%-8s' % ('%d,%d' % move) + ''.join('%15s' % counts.get(move, '-') for counts in results.values()))
+    return results
+
+
+def mismatches(results, known=None):
+    """
+    Descriptions of the disagreements between the generators (and with the
+    known count), empty when they all agree
+    """
+    problems = []
+    if not results:
+        return problems
+    reference_name, reference = next(iter(results.items()))
+    for name, counts in results.items():
+        if counts != reference:
+            moves = sorted(set(counts) | set(reference))
+            differ = ['%d,%d' % move for move in moves if counts.get(move) != reference.get(move)]
+            problems.append('%s differs from %s after %s' % (name, reference_name, ' '.join(differ)))
+        if known is not None and sum(counts.values()) != known:
+            problems.append('%s: %d instead of the known %d' % (name, sum(counts.values()), known))
+    return problems
+
+
+if __name__ == "__main__":
+    (choices, args) = getopt.getopt(sys.argv[1:], "d:g:vc")
+    options = dict(choices)
+    depth = int(options.get('-d', 6))
+    if depth < 1:
+        print('The depth must be at least 1')
+        sys.exit(2)
+    names = options['-g'].split(',') if '-g' in options else GENERATORS
+    for name in names:
+        if name not in GENERATORS:
+            print('Unknown generator %s, choose from %s' % (name, ', '.join(GENERATORS)))
+            sys.exit(2)
+    names = available(names)
+    if '-c' in options:
+        from benchmark import corpus_positions
+        positions = corpus_positions() + [('passes', own, opp) for own, opp in PASS_POSITIONS]
+        starts = [('%s %016X %016X' % (phase, own, opp), own, opp, None) for phase, own, opp in positions]
+    else:
+        own, opp = start_position()
+        starts = [('start', own, opp, KNOWN[depth] if depth < len(KNOWN) else None)]
+    problems = []
+    for label, own, opp, known in starts:
+        print(label)
+        results = run_perft(names, own, opp, depth, '-v' in options)
+        problems.extend('%s: %s' % (label, problem) for problem in mismatches(results, known))
+    for problem in problems:
+        print('MISMATCH: ' + problem)
+    if problems:
+        sys.exit(1)
+    print('all generators agree')
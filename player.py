@@ -1,18 +1,142 @@
-import copy
+import json
+import os
+import threading
+import time
+
+from bitboard import coords, iter_squares, square
+from endgame import DRAW, WIN, EndgameSolver
+from evaluation import DEFAULT_WEIGHTS_PATH, EVAL_SCALE, EvalPosition, PatternEvaluator
+from generic_search import GenericSearch
+from move_ordering import MoveOrderer
+from opening_book import DEFAULT_BOOK_PATH, OpeningBook
+from parallel_search import RootSplitter
+from rays import RAYS, get_rays
+from search_stats import SearchStats
+from transposition import EXACT, LOWER, UPPER, SIDE_KEY, TranspositionTable, zobrist_key
+
+
+_midgame_line_orders = {}
+
+
+def midgame_line_order(size):
+    """
+    [[rows, cols]] of a size x size board, from the most probable position to
+    be chosen to the least probable (see find_midgame_moves). A group of
+    lines is the pair at one distance from the walls: walls, then the inner
+    lines, the lines next to the walls last. On 8x8 the groups are [0, 7],
+    [1, 6], [2, 5] and [3, 4].
+    """
+    order = _midgame_line_orders.get(size)
+    if order is None:
+        lines = [sorted({distance, size - 1 - distance}) for distance in range((size + 1) // 2)]
+        walls, near = lines[0], lines[1] if len(lines) > 1 else None
+        inner = lines[2:]
+        order = [[walls, walls]] + [[walls, line] for line in inner]
+        for index, line in enumerate(inner):
+            order.extend([line, other] for other in inner[index:])
+        if near is not None:
+            order.extend([near, line] for line in inner)
+            order.extend([[walls, near], [near, near]])
+        _midgame_line_orders[size] = order
+    return order
+
+
+def _midgame_order():
+    # Squares of the 8x8 board sorted from the most probable position to be
+    # chosen to the least probable
+    squares = []
+    for rows, cols in midgame_line_order(8):
+        for row in rows:
+            for col in cols:
+                squares.append(row * 8 + col)
+        if rows != cols:
+            for row in cols:
+                for col in rows:
+                    squares.append(row * 8 + col)
+    return squares
+
+
+# Scores of the search are in the weight units of the evaluation (1/EVAL_SCALE
+# discs); the preev_board values and the scores of positions without moves,
+# counted in discs, are scaled to them. All scores lie within +-SCORE_BOUND
+SCORE_BOUND = 10000 * EVAL_SCALE
+
+# Pondering searches the other replies of the opponent this many plies less
+# deep than the reply our search expects
+PONDER_OTHER_LAG = 2
+
+
+class SearchTimeout(Exception):
+    # Raised inside the search when the time budget of the move is used up
+    pass
+
+
+MIDGAME_ORDER = _midgame_order()
+MIDGAME_RANK = [0] * 64
+for _rank, _sq in enumerate(MIDGAME_ORDER):
+    MIDGAME_RANK[_sq] = _rank
 
 
 class MyPlayer:
     """
-    Alpha-Beta pruning with variable depth (4-8 moves ahead) + heuristics for playing board
+    Alpha-Beta pruning with iterative deepening under a time budget + heuristics for playing board
     The best reversi bot
     """
-    def __init__(self, my_color, opponent_color):
+    def __init__(self, my_color, opponent_color, time_limit_ms=800, endgame_empties=14, workers=1,
+                 book_path=DEFAULT_BOOK_PATH, weights_path=DEFAULT_WEIGHTS_PATH, ponder=False,
+                 stats_path=None, max_depth=None):
         self.name = 'galkidmi'
         self.my_color = my_color
         self.opponent_color = opponent_color
-        self.depth = 4  # depth of the recursive alpha-beta pruning
+        # The game drivers treat a move over 1000 ms as lost, keep a margin
+        self.time_limit_ms = time_limit_ms
+        self.deadline = 0
+        self.clock_mask = 1023  # the clock is read every clock_mask + 1 nodes
+        self.nodes = 0
+        self.depth = 1  # depth of the current iteration of the alpha-beta pruning
+        # Deepest iteration (None - until the deadline), makes the search reproducible for benchmarks
+        self.max_depth = max_depth
+        self.completed_depth = 0  # depth of the last completed iteration (empties when solved)
+        # Statistics of the last move for the game drivers: nodes, depth, time_ms, nps,
+        # first_move_cutoff_rate
+        self.search_info = None
+        self.root_best_sq = None  # best move of the last completed iteration
+        # With this many empty squares or fewer the game is solved exactly
+        self.endgame_empties = endgame_empties
+        self.endgame_solver = EndgameSolver()
+        self.endgame_result = None  # WIN/DRAW/LOSS proven by the last solved move
+        self.endgame_score = None  # final disc difference proven by the last solved move
         self.cur_move = []
+        self.root_board = None
         self.is_midgame = False
+        # Search results shared between the moves of one game
+        self.transposition_table = TranspositionTable()
+        self.move_orderer = MoveOrderer(MIDGAME_RANK)
+        # Leaf evaluation, the weights are loaded once per process
+        self.evaluator = PatternEvaluator.load(weights_path)
+        # Moves of the first plies, the book file is mapped on the first lookup (None - no book)
+        self.opening_book = OpeningBook(book_path) if book_path is not None else None
+        # Root moves are split across this many processes (None - one per CPU core)
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.root_splitter = None
+        if workers > 1:
+            # The workers score root moves with the same evaluation and endgame size as this player
+            self.root_splitter = RootSplitter(my_color, opponent_color, workers, endgame_empties=endgame_empties,
+                                              book_path=book_path, weights_path=weights_path)
+        # Searches of the boards other than 8x8 by size, created on the first move
+        self.generic_searches = {}
+        # Pondering: between our moves a thread searches the positions after the
+        # opponent's replies, the next move finds them in the transposition table
+        self.ponder = ponder
+        self.ponder_thread = None
+        self.ponder_nodes = 0  # nodes searched while the opponent was thinking
+        self.ponder_expected = None  # (own, opp) after the reply pondered the most
+        # Search statistics of every move, appended to stats_path as JSON lines (None - off)
+        self.stats = None
+        self.stats_file = None
+        if stats_path is not None:
+            self.enable_stats(stats_path)
         # A pre-evaluated table. Helps choose good moves in the early game.
         self.preev_board = [
             [1000, -300, 100, 80, 80, 100, -300, 1000],
@@ -26,135 +150,419 @@ class MyPlayer:
         ]
 
     def move(self, board):
-        self.calculate_depth(board)
-        self.is_midgame = self.count_score(board, -1) < self.count_score(board, self.my_color)
+        start = time.perf_counter()
+        self.stop_pondering()
+        self.deadline = start + self.time_limit_ms / 1000.0
+        if len(board) != 8:
+            return self.move_generic(board, start)
+
+        # Perform minimax on the bitboard position to find the best move.
+        # The search makes and unmakes moves on this single position
+        self.root_board = board
+        self.transposition_table.new_search()
+        self.move_orderer.new_search()
+        self.move_orderer.reset_counters()
+        if self.stats is not None:
+            self.stats.reset()
+        self.nodes = 0
+        self.endgame_solver.nodes = 0
+        self.completed_depth = 0
+        position = EvalPosition.from_board(board, self.my_color, self.opponent_color)
+        self.is_midgame = position.empties() < position.own_count
+        move = None
+        if self.opening_book is not None:
+            book_sq = self.opening_book.lookup(position.own, position.opp)
+            if book_sq is not None and position.moves() >> book_sq & 1:
+                move = coords(book_sq)
+        if move is None and position.empties() <= self.endgame_empties:
+            move = self.solve_endgame(position)
+        if move is None:
+            move = self.iterative_deepening(position)
 
-        # Perform minimax to find the best move
-        move = self.minimax(copy.deepcopy(board), self.depth, -10000, 10000, my_turn=True)
+        elapsed = time.perf_counter() - start
+        nodes = self.nodes + self.endgame_solver.nodes
+        self.search_info = {'nodes': nodes, 'depth': self.completed_depth, 'time_ms': elapsed * 1000,
+                            'nps': nodes / elapsed if elapsed > 0 else 0.0,
+                            'first_move_cutoff_rate': self.move_orderer.first_move_cutoff_rate()}
+        # A search stopped by the deadline leaves moves made on `position`, the board is the root
+        position = EvalPosition.from_board(board, self.my_color, self.opponent_color)
+        if self.stats is not None:
+            self.dump_stats(position, move, elapsed)
+        if self.ponder:
+            self.search_info['ponder_nodes'] = self.ponder_nodes
+            self.search_info['ponder_hit'] = self.ponder_expected == (position.own, position.opp)
 
         # Update pre-evaluated board if a corner is taken
         if move in [[0, 0], [0, 7], [7, 0], [7, 7]]:
             self.change_preev_board(move)
 
+        if self.ponder:
+            position.make_move(square(move[0], move[1]))
+            self.start_pondering(position)
         return tuple(move)
 
-    def calculate_depth(self, board):
-        # Determine the depth depending on the stage of the game
-        current_score = self.count_score(board, -1)
-        if current_score < 9:
-            self.depth = 8  # Endgame
-        elif current_score < 12:
-            self.depth = 6  # Pre-endgame
-        elif current_score < 16:
-            self.depth = 5  # Late midgame
+    def move_generic(self, board, start):
+        '''
+        Move on a board of another size than 8x8, see generic_search.py
+        '''
+        size = len(board)
+        search = self.generic_searches.get(size)
+        if search is None:
+            search = self.generic_searches[size] = GenericSearch(size)
+        position = search.position(board, self.my_color, self.opponent_color)
+        sq = search.best_move(position, self.deadline)
+        self.completed_depth = search.completed_depth
+        elapsed = time.perf_counter() - start
+        self.search_info = {'nodes': search.nodes, 'depth': search.completed_depth, 'time_ms': elapsed * 1000,
+                            'nps': search.nodes / elapsed if elapsed > 0 else 0.0}
+        if sq is None:
+            return None
+        return tuple(search.geometry.coords(sq))
+
+    def enable_stats(self, stats_path):
+        """
+        Counts the search in self.stats (see search_stats.py), minimax and
+        probe count only while it is set
+        """
+        self.stats = SearchStats()
+        self.stats_file = open(stats_path, 'a')
+
+    def dump_stats(self, position, move, elapsed):
+        # One JSON line with the statistics of the move just searched
+        record = self.stats.record(empties=position.empties(), move=list(move) if move is not None else None,
+                                   time_ms=elapsed * 1000, depth=self.completed_depth, nodes=self.nodes,
+                                   endgame_nodes=self.endgame_solver.nodes,
+                                   cutoffs=list(self.move_orderer.cutoffs))
+        self.stats_file.write(json.dumps(record, separators=(',', ':')) + '\n')
+        self.stats_file.flush()
+
+    def start_pondering(self, position):
+        # `position` is the position after our move, the opponent is to move
+        self.deadline = float('inf')
+        self.ponder_thread = threading.Thread(target=self.ponder_search, args=(position,), daemon=True)
+        self.ponder_thread.start()
+
+    def stop_pondering(self):
+        # The search of the thread times out on its next clock check
+        if self.ponder_thread is not None:
+            self.deadline = 0
+            self.ponder_thread.join()
+            self.ponder_thread = None
+
+    def ponder_search(self, position):
+        """
+        Iterative deepening over the positions after the replies of the
+        opponent until stop_pondering(), the expected reply goes first and deepest
+        """
+        self.nodes = 0
+        # Read the clock more often, the next move waits for this search to stop
+        self.clock_mask = 127
+        # The statistics are of our moves, pondering is counted in ponder_nodes only
+        stats, self.stats = self.stats, None
+        # No new_search(), the next move() starts one and reuses what pondering stored
+        replies = position.moves()
+        if replies:
+            _, hash_move = self.probe(zobrist_key(position.own, position.opp) ^ SIDE_KEY, 0, 0, 0)
+            self.is_midgame = position.empties() < position.own_count
+            children = []
+            for sq in self.order_moves(replies, hash_move):
+                child = position.copy()
+                child.make_move(sq)
+                children.append(child)
+        else:
+            position.make_pass()
+            children = [position]
+        # Positions we can move in, the endgame solver is fast enough without pondering
+        children = [child for child in children if child.moves() and child.empties() > self.endgame_empties]
+        self.ponder_expected = (children[0].own, children[0].opp) if children else None
+        best_squares = [None] * len(children)
+        try:
+            for depth in range(1, position.empties() + 1):
+                for index, child in enumerate(children):
+                    child_depth = depth - (0 if index == 0 else PONDER_OTHER_LAG)
+                    if child_depth < 1:
+                        continue
+                    self.root_board = child.to_board(self.my_color, self.opponent_color)
+                    self.root_best_sq = best_squares[index]
+                    self.is_midgame = child.empties() < child.own_count
+                    self.depth = child_depth
+                    best_squares[index] = self.search_root(child, child_depth)
+        except SearchTimeout:
+            pass
+        self.clock_mask = 1023
+        self.stats = stats
+        self.ponder_nodes = self.nodes
+
+    def close(self):
+        # Stops pondering and the worker processes of the parallel root search,
+        # unmaps the book and closes the statistics file
+        self.stop_pondering()
+        if self.root_splitter is not None:
+            self.root_splitter.close()
+            self.root_splitter = None
+        if self.opening_book is not None:
+            self.opening_book.close()
+        if self.stats_file is not None:
+            self.stats_file.close()
+            self.stats_file = None
+
+    def solve_endgame(self, position):
+        """
+        Perfect play for the last empty squares. The win/loss/draw result is
+        proven first with half of the time, then the exact disc difference.
+        Returns None if even the result cannot be proven in time, the midgame
+        search then uses the rest of the time
+        """
+        self.endgame_result = None
+        self.endgame_score = None
+        now = time.perf_counter()
+        solved = self.endgame_solver.solve_result(position.own, position.opp,
+                                                  now + (self.deadline - now) / 2)
+        if solved is None:
+            return None
+        best_sq, self.endgame_result = solved
+        if self.endgame_result == DRAW:
+            self.endgame_score = 0
+        else:
+            # The result tells on which side of zero the exact score lies
+            if self.endgame_result == WIN:
+                alpha, beta = 0, 64
+            else:
+                alpha, beta = -64, 0
+            solved = self.endgame_solver.solve(position.own, position.opp, self.deadline, alpha, beta)
+            if solved is not None:
+                best_sq, self.endgame_score = solved
+        self.completed_depth = position.empties()
+        return coords(best_sq)
+
+    def iterative_deepening(self, position):
+        """
+        Searches depth 1, 2, 3, ... until the deadline. An unfinished
+        iteration is thrown away, the move of the last completed one is played
+        """
+        moves = position.moves()
+        if not moves:
+            return None
+        self.root_best_sq = None
+        best_move = coords(self.order_moves(moves)[0])
+        # Without passes the game cannot last longer than the number of empty squares
+        last_depth = position.empties()
+        if self.max_depth is not None:
+            last_depth = min(last_depth, self.max_depth)
+        for depth in range(1, last_depth + 1):
+            self.depth = depth
+            try:
+                if self.root_splitter is not None:
+                    best_sq = self.search_root_parallel(position, depth)
+                else:
+                    best_sq = self.search_root(position, depth)
+            except SearchTimeout:
+                if self.stats is not None:
+                    self.stats.end_iteration(depth, self.nodes, completed=False)
+                break
+            if self.stats is not None:
+                self.stats.end_iteration(depth, self.nodes)
+            best_move = coords(best_sq)
+            self.root_best_sq = best_sq
+            self.completed_depth = depth
+        return best_move
 
+    def root_moves(self, position):
+        """
+        Ordered root moves as (square, preev_board value, static score).
+        If we've already made more than 8 moves, we'll start to go out of the
+        central square if the position is safe: such moves are not searched
+        and get the static score, other moves have static score None
+        """
+        leave_center = position.empties() < 50
+        my_score = position.own_count
+        root_moves = []
+        for sq in self.order_moves(position.moves(), self.root_best_sq):
+            self.cur_move = coords(sq)
+            value = self.preev_board[self.cur_move[0]][self.cur_move[1]] * EVAL_SCALE
+            static = None
+            if leave_center and self.check_position() and self.is_safe(self.root_board):
+                # We will be closer to the walls and corners. It is very good for us
+                static = my_score * EVAL_SCALE - value
+            root_moves.append((sq, value, static))
+        return root_moves
 
-    def minimax(self, board, cur_depth, alpha, beta, my_turn):
+    def search_root(self, position, depth):
+        """
+        Returns the best root square of a search `depth` moves ahead
         """
-        Alpha-Beta pruning algorithm, depth is 4-8
+        alpha = -SCORE_BOUND
+        best_sq = None
+        for sq, value, static in self.root_moves(position):
+            if static is None:
+                score = self.search_root_move(position, sq, depth, alpha, value)
+            else:
+                score = static
+            if score > alpha:
+                alpha = score
+                best_sq = sq
+        return best_sq
+
+    def search_root_move(self, position, sq, depth, alpha, value):
+        # The subtree is searched without the preev_board value of the root move
+        position.make_move(sq)
+        score = self.minimax(position, depth - 1, alpha - value, SCORE_BOUND - value, my_turn=False)
+        position.undo_move()
+        return score + value
+
+    def search_root_parallel(self, position, depth):
+        """
+        Young brothers wait at the root: the first root move is searched here
+        to get a bound, the other moves are split across the worker processes
+        """
+        alpha = -SCORE_BOUND
+        best_sq = None
+        tasks = []
+        for sq, value, static in self.root_moves(position):
+            if static is not None:
+                score = static
+            elif best_sq is None:
+                score = self.search_root_move(position, sq, depth, alpha, value)
+            else:
+                position.make_move(sq)
+                tasks.append((sq, position.own, position.opp, depth - 1, value))
+                position.undo_move()
+                continue
+            if score > alpha:
+                alpha = score
+                best_sq = sq
+
+        scores = self.root_splitter.search(tasks, alpha, self.transposition_table.generation,
+                                           self.deadline)
+        if scores is None:
+            raise SearchTimeout()
+        for task, score in zip(tasks, scores):
+            if score is not None and score > alpha:
+                alpha = score
+                best_sq = task[0]
+        return best_sq
+
+    def minimax(self, position, cur_depth, alpha, beta, my_turn):
+        """
+        Alpha-Beta pruning algorithm
         alpha - tries to maximise our points
         beta - tries to minimise our points
+        position.own always holds the discs of the player to move.
+        Scores below the root depend only on the position, so they can be
+        shared through the transposition table; the preev_board value of the
+        root move is added in search_root_move.
         """
+        self.nodes += 1
+        if not self.nodes & self.clock_mask and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+        if self.stats is not None:
+            self.stats.count_node(self.depth - cur_depth, cur_depth == 0)
         if cur_depth == 0:
-            score = self.count_score(board, self.my_color) - \
-                    self.count_score(board, self.opponent_color)
-            score += self.preev_board[self.cur_move[0]][self.cur_move[1]]
-            return score
+            # Pattern evaluation for us, the pattern indices are kept up to date by the position
+            return self.evaluator.evaluate(position)
         elif my_turn:
-            return self.maximizer(board, cur_depth, alpha, beta)
+            return self.maximizer(position, cur_depth, alpha, beta)
         else:
-            return self.minimizer(board, cur_depth, alpha, beta)
+            return self.minimizer(position, cur_depth, alpha, beta)
 
-    def maximizer(self, board, cur_depth, alpha, beta):
-        # Tries to maximise my points
-        best_move = []
+    def order_moves(self, moves, hash_move=None):
+        # Converts a bitboard of moves into a list of squares. The best move
+        # stored in the transposition table goes first, in the midgame the
+        # most promising squares (corners, walls) follow
+        squares = list(iter_squares(moves))
         if self.is_midgame:
-            moves = self.find_midgame_moves(board, my_turn=True)
-        else:
-            moves = self.find_moves(board, self.my_color, self.opponent_color)
-        if moves == [] and cur_depth != self.depth:
-            # We will not have any moves at some depth -> Very good for the opponent
-            return -1001 + self.count_score(board, self.my_color)
-        elif moves == [] and cur_depth == self.depth:
-            # We do not have any possible moves -> None
-            return None
-        # Evaluating all possible moves
-        for move in moves:
-            # if we've already made more than 8 moves, we'll start to
-            # go out of the central square, if position is safe
-            if cur_depth == self.depth:
-                self.cur_move = move
-                if self.count_score(board, -1) < 50 and self.check_position():
-                    if self.is_safe(board):
-                        # We will be closer to the walls and corners. It is
-                        # very good for us
-                        my_score = self.count_score(board, self.my_color)
-                        alpha = my_score - self.preev_board[move[0]][move[1]]
-                        best_move = move
-                        continue
-            board_copy = self.repaint_the_board(copy.deepcopy(board), move[0], move[1], my_turn=True)
-            # We've repainted the board, now it's time to evaluate the move
-            score = self.minimax(board_copy, cur_depth - 1, alpha, beta,
-                                 my_turn=False)
-            if score > alpha:
-                alpha = score
-                best_move = move
-            if beta <= alpha:
-                break
-        if cur_depth == self.depth:
-            return best_move
+            squares.sort(key=MIDGAME_RANK.__getitem__)
+        if hash_move is not None and hash_move != squares[0] and hash_move in squares:
+            squares.remove(hash_move)
+            squares.insert(0, hash_move)
+        return squares
+
+    def probe(self, key, cur_depth, alpha, beta):
+        # Returns (score or None, hash move). The score is returned only when
+        # the stored result is deep enough to end the search of this node
+        entry = self.transposition_table.probe(key)
+        score = hash_move = None
+        if entry is not None:
+            _, depth, bound, stored, hash_move, _ = entry
+            if depth >= cur_depth:
+                if bound == EXACT or (bound == LOWER and stored >= beta) or \
+                        (bound == UPPER and stored <= alpha):
+                    score = stored
+        if self.stats is not None:
+            self.stats.count_probe(score, hash_move)
+        return score, hash_move
+
+    def store(self, key, cur_depth, alpha, beta, score, best_move):
+        if score <= alpha:
+            bound = UPPER
+        elif score >= beta:
+            bound = LOWER
         else:
-            return alpha
+            bound = EXACT
+        self.transposition_table.store(key, cur_depth, bound, score, best_move)
 
-    def maximizer(self, board, cur_depth, alpha, beta):
+    def maximizer(self, position, cur_depth, alpha, beta):
         """
         Tries to maximize our points
         """
-        best_move = []
-        moves = self.find_midgame_moves(board, my_turn=True) if self.is_midgame else \
-                self.find_moves(board, self.my_color, self.opponent_color)
+        key = zobrist_key(position.own, position.opp)
+        score, hash_move = self.probe(key, cur_depth, alpha, beta)
+        if score is not None:
+            return score
 
-        if not moves and cur_depth != self.depth:
+        moves = position.moves()
+        if not moves:
             # We will not have any moves at some depth -> Very good for the opponent
-            return -1001 + self.count_score(board, self.my_color)
-        elif not moves and cur_depth == self.depth:
-            return None
-
-        for move in moves:
-            if cur_depth == self.depth:
-                self.cur_move = move
-                if self.count_score(board, -1) < 50 and self.check_position() and self.is_safe(board):
-                    alpha = self.count_score(board, self.my_color) - self.preev_board[move[0]][move[1]]
-                    best_move = move
-                    continue
+            return (-1001 + position.own_count) * EVAL_SCALE
 
-            board_copy = self.repaint_the_board(copy.deepcopy(board), move[0], move[1], my_turn=True)
-            score = self.minimax(board_copy, cur_depth - 1, alpha, beta, my_turn=False)
+        alpha_orig = alpha
+        best_sq = None
+        ply = self.depth - cur_depth
+        ordered = self.move_orderer.order(position.own, position.opp, moves, hash_move, ply, 0, cur_depth)
+        for index, sq in enumerate(ordered):
+            position.make_move(sq)
+            score = self.minimax(position, cur_depth - 1, alpha, beta, my_turn=False)
+            position.undo_move()
             if score > alpha:
                 alpha = score
-                best_move = move
+                best_sq = sq
             if beta <= alpha:
+                self.move_orderer.record_cutoff(sq, index, ply, 0, cur_depth)
                 break
 
-        return best_move if cur_depth == self.depth else alpha
+        self.store(key, cur_depth, alpha_orig, beta, alpha, best_sq)
+        return alpha
 
-    def minimizer(self, board, cur_depth, alpha, beta):
-        # Tries to minimise my score
-        if self.is_midgame == True:
-            moves = self.find_midgame_moves(board, my_turn=False)
-        else:
-            moves = self.find_moves(board, self.opponent_color, self.my_color)
-        if moves == []:
+    def minimizer(self, position, cur_depth, alpha, beta):
+        """
+        Tries to minimise our points
+        """
+        key = zobrist_key(position.own, position.opp) ^ SIDE_KEY
+        score, hash_move = self.probe(key, cur_depth, alpha, beta)
+        if score is not None:
+            return score
+
+        moves = position.moves()
+        if not moves:
             # An opponent does not have any moves -> Very good for us
-            return 1000 + self.count_score(board, self.my_color)
-        for move in moves:
-            board_copy = self.repaint_the_board(copy.deepcopy(board), move[0],
-                                                move[1], my_turn=False)
-            score = self.minimax(board_copy, cur_depth - 1, alpha, beta,
-                                 my_turn=True)
-            beta = min(beta, score)
+            return (1000 + position.opp_count) * EVAL_SCALE
+
+        beta_orig = beta
+        best_sq = None
+        ply = self.depth - cur_depth
+        ordered = self.move_orderer.order(position.own, position.opp, moves, hash_move, ply, 1, cur_depth)
+        for index, sq in enumerate(ordered):
+            position.make_move(sq)
+            score = self.minimax(position, cur_depth - 1, alpha, beta, my_turn=True)
+            position.undo_move()
+            if score < beta:
+                beta = score
+                best_sq = sq
             if beta <= alpha:
+                self.move_orderer.record_cutoff(sq, index, ply, 1, cur_depth)
                 break
+
+        self.store(key, cur_depth, alpha, beta_orig, beta, best_sq)
         return beta
 
     def is_safe(self, board):
@@ -163,45 +571,36 @@ class MyPlayer:
         # This method defines if it is dangerous for us to make a move
         # "out of the comfort zone" or not. Dangerous = an opponent can get a
         # corner or a wall after the move
-        direction_y = [1, 1, 0, -1, -1, -1, 0, 1]  # 1 - lower, -1 - higher
-        direction_x = [0, 1, 1, 1, 0, -1, -1, -1]  # 1 - right, -1 - left
+        rays = RAYS[self.cur_move[0]][self.cur_move[1]]
         for condition in range(8):  # Choose a direction
             is_dangerous = 0
-            for depth in range(1, 8):  # Follow this direction
-                new_y = self.cur_move[0] + depth * direction_y[condition]
-                new_x = self.cur_move[1] + depth * direction_x[condition]
-                if (-1 < new_x < 8) and (-1 < new_y < 8):
-                    if board[new_y][new_x] == self.my_color:
-                        # We met our cell -> at this direction we are vulnerable,
-                        # our opponent can possibly flip our cells and get a
-                        # wall/corner
-                        is_dangerous = 1
-                    elif board[new_y][new_x] == -1:
-                        # if we make a move, we'll flip some of the opponents cells
-                        # if we met an empty cell and before our move in the opposite
-                        # direction there is an opponent's cell, he can flip my
-                        # cells and get the wall/corner
-                        prev_x = self.cur_move[1] - direction_x[condition]
-                        prev_y = self.cur_move[0] - direction_y[condition]
-                        if is_dangerous == 1 and \
-                                board[prev_y][prev_x] == self.opponent_color and \
-                                -1 < prev_x < 8 and -1 < prev_y < 8:
-                            # direction is dangerous, FALSE
-                            return False
-                        else:
-                            # This direction is safe, change direction
-                            break
-                    elif board[new_y][new_x] == self.opponent_color:
-                        if is_dangerous == 1:
-                            # We met an opponent's cell after ours ->
-                            # direction is dangerous
-                            return False
-                        else:
-                            # This direction is safe, change direction
-                            continue
-                else:
-                    # out of board, change direction
-                    break
+            for new_y, new_x in rays[condition]:  # Follow this direction
+                if board[new_y][new_x] == self.my_color:
+                    # We met our cell -> at this direction we are vulnerable,
+                    # our opponent can possibly flip our cells and get a
+                    # wall/corner
+                    is_dangerous = 1
+                elif board[new_y][new_x] == -1:
+                    # if we make a move, we'll flip some of the opponents cells
+                    # if we met an empty cell and before our move in the opposite
+                    # direction there is an opponent's cell, he can flip my
+                    # cells and get the wall/corner
+                    behind = rays[(condition + 4) % 8]
+                    if is_dangerous == 1 and behind and \
+                            board[behind[0][0]][behind[0][1]] == self.opponent_color:
+                        # direction is dangerous, FALSE
+                        return False
+                    else:
+                        # This direction is safe, change direction
+                        break
+                elif board[new_y][new_x] == self.opponent_color:
+                    if is_dangerous == 1:
+                        # We met an opponent's cell after ours ->
+                        # direction is dangerous
+                        return False
+                    else:
+                        # This direction is safe, change direction
+                        continue
         return True
 
     def check_position(self):
@@ -220,8 +619,9 @@ class MyPlayer:
     def count_score(self, board, color):
         # Counts the amount of cells with particular color
         score = 0
-        for y in range(8):
-            for x in range(8):
+        size = len(board)
+        for y in range(size):
+            for x in range(size):
                 if board[y][x] == color:
                     score += 1
         return score
@@ -230,8 +630,9 @@ class MyPlayer:
         # Finds all valid moves that we can make with the current state of
         # the game board
         moves = []
-        for i in range(8):
-            for j in range(8):
+        size = len(board)
+        for i in range(size):
+            for j in range(size):
                 if board[i][j] == p1_color:
                     valid_moves = self.find_moves_for_cell(board, i, j, p2_color)
                     for move in valid_moves:
@@ -242,27 +643,19 @@ class MyPlayer:
     def find_moves_for_cell(self, board, y, x, p2_color):
         # Finds all the moves that we can make due to obtaining a specific cell
         # of the playing board with coordinats (x, y)
-        direction_y = [1, 1, 0, -1, -1, -1, 0, 1]  # 1 - lower, -1 - higher
-        direction_x = [0, 1, 1, 1, 0, -1, -1, -1]  # 1 - right, -1 - left
         valid_moves = []
-        for condition in range(8):  # choose a direction
+        for ray in get_rays(len(board))[y][x]:  # choose a direction
             move_is_valid = 0
-            for depth in range(1, 8):  # follow the direction
-                new_y = y + depth * direction_y[condition]
-                new_x = x + depth * direction_x[condition]
-                if (-1 < new_x < 8) and (-1 < new_y < 8):
-                    if board[new_y][new_x] == p2_color:
-                        # We need to cover at least one opponent's cell to make a move
-                        move_is_valid = 1
-                    elif board[new_y][new_x] == -1 and move_is_valid == 1:
-                        # Valid move has been found, change direction
-                        valid_moves.append([new_y, new_x])
-                        break
-                    else:
-                        # There is no valid move in this direction
-                        break
+            for new_y, new_x in ray:  # follow the direction
+                if board[new_y][new_x] == p2_color:
+                    # We need to cover at least one opponent's cell to make a move
+                    move_is_valid = 1
+                elif board[new_y][new_x] == -1 and move_is_valid == 1:
+                    # Valid move has been found, change direction
+                    valid_moves.append([new_y, new_x])
+                    break
                 else:
-                    # out of board, change direction
+                    # There is no valid move in this direction
                     break
         return valid_moves
 
@@ -275,35 +668,19 @@ class MyPlayer:
         else:
             p2_color = self.my_color
             p1_color = self.opponent_color
-        direction_y = [1, 1, 0, -1, -1, -1, 0, 1]  # 1 - lower, -1 - higher
-        direction_x = [0, 1, 1, 1, 0, -1, -1, -1]  # 1 - right, -1 - left
-        for condition in range(8):
-            repainting_is_valid = 0
-            for depth in range(8):
-                new_y = y + depth * direction_y[condition]
-                new_x = x + depth * direction_x[condition]
-                if (-1 < new_x < 8) and (-1 < new_y < 8):
-                    if board[new_y][new_x] == p2_color:
-                        # We have cells for repainting
-                        repainting_is_valid = 1
-                    elif board[new_y][new_x] == p1_color and \
-                            repainting_is_valid == 1:
-                        # Go back until the cell [x, y] and repaint all the cells
-                        for height in range(depth - 1, 0, -1):
-                            new_y = y + height * direction_y[condition]
-                            new_x = x + height * direction_x[condition]
-                            if board[new_y][new_x] == p2_color:
-                                board[new_y][new_x] = p1_color
-                        break
-                    elif depth == 0:
-                        # The initial [x, y] cell must be repainted too
-                        board[new_y][new_x] = p1_color
-                    else:
-                        # There is no valid repainting in this direction
-                        break
-                else:
-                    # out of board, change direction
-                    break
+        # The initial [x, y] cell must be repainted too
+        board[y][x] = p1_color
+        for ray in get_rays(len(board))[y][x]:
+            for depth, (new_y, new_x) in enumerate(ray):
+                if board[new_y][new_x] == p2_color:
+                    # We have cells for repainting
+                    continue
+                if board[new_y][new_x] == p1_color:
+                    # Go back until the cell [x, y] and repaint all the cells
+                    for old_y, old_x in ray[:depth]:
+                        board[old_y][old_x] = p1_color
+                # There is no valid repainting in this direction
+                break
         return board
 
     def change_preev_board(self, move):
@@ -345,12 +722,9 @@ class MyPlayer:
         # probable position to be chosen to the least probable
         moves = []
         found_moves = []
-        order = [[[0, 7], [0, 7]], [[0, 7], [2, 5]], [[0, 7], [3, 4]],
-                 [[2, 5], [2, 5]], [[2, 5], [3, 4]], [[1, 6], [2, 5]],
-                 [[1, 6], [3, 4]], [[0, 7], [1, 6]], [[1, 6], [1, 6]]]
-        # Order: corners, cells with cost 100, 80, 3, 1, -45, -50, -80, -300,
-        # -500 in cell_costs
-        for position in order:
+        # Order on 8x8: corners, cells with cost 100, 80, 3, 1, -45, -50, -80,
+        # -300, -500 in cell_costs
+        for position in midgame_line_order(len(board)):
             found_moves = self.find_moves_for_position(position[0], position[1],
                                                        board, my_turn)
             if found_moves != []:
@@ -382,25 +756,17 @@ class MyPlayer:
         else:
             p2_color = self.my_color
             p1_color = self.opponent_color
-        direction_y = [1, 1, 0, -1, -1, -1, 0, 1]  # 1 - lower, -1 - higher
-        direction_x = [0, 1, 1, 1, 0, -1, -1, -1]  # 1 - right, -1 - left
-        for condition in range(8):  # Choose a direction
+        for ray in get_rays(len(board))[row][col]:  # Choose a direction
             move_is_valid = 0
-            for depth in range(1, 8):  # Follow the direction
-                new_row = row + depth * direction_y[condition]
-                new_col = col + depth * direction_x[condition]
-                if (-1 < new_col < 8) and (-1 < new_row < 8):
-                    if board[new_row][new_col] == p2_color:
-                        # We need to cover at least one opponent's cell to make a move
-                        move_is_valid = 1
-                    elif board[new_row][new_col] == p1_color and \
-                            move_is_valid == 1:
-                        # Valid move has been found
-                        return True
-                    else:
-                        # There is no valid move in this direction
-                        break
+            for new_row, new_col in ray:  # Follow the direction
+                if board[new_row][new_col] == p2_color:
+                    # We need to cover at least one opponent's cell to make a move
+                    move_is_valid = 1
+                elif board[new_row][new_col] == p1_color and \
+                        move_is_valid == 1:
+                    # Valid move has been found
+                    return True
                 else:
-                    # out of board, change the direction
+                    # There is no valid move in this direction
                     break
         return False
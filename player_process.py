@@ -0,0 +1,164 @@
+"""
+Players in worker processes with a hard time limit per move.
+
+PlayerProcess runs a player in its own process for the whole game and the
+driver calls its move() as it would call the player's. The board goes over a
+pipe as one byte per square (color + 1), the answer is the move as two int16
+(-1, -1 for None) followed by the pickled search_info of the player, if it
+has one. A player that does not answer within the time limit has its process
+terminated and move() raises MoveTimeout, so a hung player costs the game
+instead of freezing the driver. The next move() starts a new process with a
+copy of the player as it was given to PlayerProcess.
+
+A player instance reaches the worker by fork, where the platform has it
+(under spawn it would be pickled). A player holding an open file or its own
+process pool (MyPlayer(stats_path=...), MyPlayer(workers=2)) does not survive
+either, so give PlayerProcess.from_factory a picklable callable instead, e.g.
+functools.partial(player.MyPlayer, 0, 1, workers=2); the worker calls it to
+build the player. Such a worker is not a daemon, daemons cannot start the
+pool, so close() it when done.
+"""
+import math
+import multiprocessing
+import pickle
+import struct
+import time
+
+MOVE = struct.Struct('<hh')
+NO_MOVE = (-1, -1)
+STOP = b''  # asks the worker to close the player and exit
+
+
+class MoveTimeout(Exception):
+    def __init__(self, elapsed_ms):
+        super().__init__('no move in %.3f ms' % elapsed_ms)
+        self.elapsed_ms = elapsed_ms
+
+
+def encode_board(board):
+    return bytes([cell + 1 for row in board for cell in row])
+
+
+def decode_board(data):
+    size = math.isqrt(len(data))
+    cells = [value - 1 for value in data]
+    return [cells[start:start + size] for start in range(0, len(cells), size)]
+
+
+def _context():
+    # fork copies the player into the worker, spawn would pickle it
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
+def _serve(connection, player, factory=None):
+    # Worker process: builds the player from the factory, if given, reports
+    # its name, then answers moves until STOP or until the driver goes away
+    if factory is not None:
+        player = factory()
+    connection.send_bytes(pickle.dumps(getattr(player, 'name', None), pickle.HIGHEST_PROTOCOL))
+    while True:
+        try:
+            data = connection.recv_bytes()
+        except EOFError:
+            break
+        if data == STOP:
+            break
+        move = player.move(decode_board(data))
+        reply = MOVE.pack(*(NO_MOVE if move is None else (int(move[0]), int(move[1]))))
+        search_info = getattr(player, 'search_info', None)
+        if search_info:
+            reply += pickle.dumps(search_info, pickle.HIGHEST_PROTOCOL)
+        connection.send_bytes(reply)
+    if hasattr(player, 'close'):
+        player.close()
+    connection.close()
+
+
+class PlayerProcess:
+    """
+    A player running in a persistent worker process, move() takes at most
+    move_limit_ms (plus the pipe round trip)
+    """
+
+    def __init__(self, player, move_limit_ms=1000, factory=None):
+        self.player = player
+        self.factory = factory  # builds the player in the worker, player is then None
+        self.name = getattr(player, 'name', None)
+        self.move_limit_ms = move_limit_ms
+        self.search_info = None  # search_info of the player after its last move
+        self.overtimes = 0  # moves cut off at the time limit
+        self.process = None
+        self.connection = None
+        # Started right away, the start-up is not charged to the first move
+        self.start()
+
+    @classmethod
+    def from_factory(cls, factory, move_limit_ms=1000):
+        """
+        A PlayerProcess whose player is built by factory() in the worker,
+        factory must be picklable
+        """
+        return cls(None, move_limit_ms, factory)
+
+    def start(self):
+        context = _context()
+        self.connection, worker_connection = context.Pipe()
+        # A daemon, so a hung player does not keep the driver from exiting,
+        # except when the worker builds the player, which may start a pool
+        self.process = context.Process(target=_serve, args=(worker_connection, self.player, self.factory),
+                                       daemon=self.factory is None)
+        self.process.start()
+        worker_connection.close()
+        # Waits until the player is built, its name comes first
+        try:
+            self.name = pickle.loads(self.connection.recv_bytes())
+        except EOFError:
+            self.terminate()
+            raise RuntimeError('the worker could not build the player')
+
+    def move(self, board):
+        if self.process is None:
+            self.start()
+        start = time.perf_counter()
+        self.connection.send_bytes(encode_board(board))
+        if not self.connection.poll(self.move_limit_ms / 1000.0):
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.terminate()
+            self.overtimes += 1
+            self.search_info = None
+            raise MoveTimeout(elapsed_ms)
+        try:
+            reply = self.connection.recv_bytes()
+        except EOFError:
+            # The player crashed, its traceback is printed by the worker
+            self.terminate()
+            self.search_info = None
+            return None
+        move = MOVE.unpack_from(reply)
+        self.search_info = pickle.loads(reply[MOVE.size:]) if len(reply) > MOVE.size else None
+        return None if move == NO_MOVE else move
+
+    def terminate(self):
+        self.process.terminate()
+        self.process.join()
+        self.connection.close()
+        self.process = None
+        self.connection = None
+
+    def close(self):
+        # Lets the worker close the player, kills it if it does not exit
+        if self.process is None:
+            return
+        try:
+            self.connection.send_bytes(STOP)
+        except OSError:
+            pass
+        self.process.join(1.0)
+        if self.process.is_alive():
+            self.terminate()
+        else:
+            self.connection.close()
+            self.process = None
+            self.connection = None
@@ -0,0 +1,105 @@
+"""
+Memory-mapped position database.
+
+A read-only table of precomputed position data (opening book moves, endgame
+results, ...) which is not loaded into Python objects: the file is mapped
+with mmap and searched in place with binary search, so opening it costs
+nothing and worker processes of a tournament share the pages of one file
+through the OS page cache.
+
+File format (little endian): magic b'RVDB', version (uint32), number of
+records (uint32), value size in bytes (uint32), then fixed-size records
+sorted by key: key (uint64), value (value size bytes).
+Keys are position hashes (see position_key) of the canonical orientation
+of positions, the meaning of the values is up to the table.
+"""
+import mmap
+import os
+import struct
+
+from transposition import zobrist_key
+
+MAGIC = b'RVDB'
+VERSION = 1
+HEADER = struct.Struct('<4sIII')
+KEY = struct.Struct('<Q')
+
+
+def position_key(own, opp):
+    # Zobrist tables are generated from a fixed seed, so keys are stable between runs
+    return zobrist_key(own, opp)
+
+
+def write_database(path, records, value_size):
+    """
+    Writes {key: value bytes} to a database file
+    """
+    with open(path, 'wb') as db_file:
+        db_file.write(HEADER.pack(MAGIC, VERSION, len(records), value_size))
+        for key in sorted(records):
+            value = records[key]
+            if len(value) != value_size:
+                raise ValueError('value of key %d has %d bytes, not %d' % (key, len(value), value_size))
+            db_file.write(KEY.pack(key))
+            db_file.write(value)
+
+
+class PositionDatabase:
+    """
+    Binary search in a memory-mapped database file, mapped on the first lookup
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.data = None
+        self.count = 0
+        self.value_size = 0
+        self.record_size = KEY.size
+
+    def open(self):
+        # A missing or empty file is an empty database
+        self.data = b''
+        self.count = 0
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < HEADER.size:
+            return
+        with open(self.path, 'rb') as db_file:
+            # The mapping stays valid after the file is closed
+            self.data = mmap.mmap(db_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count, self.value_size = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError('%s is not a position database of version %d' % (self.path, VERSION))
+        self.record_size = KEY.size + self.value_size
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.data = None
+
+    def __len__(self):
+        if self.data is None:
+            self.open()
+        return self.count
+
+    def lookup(self, key):
+        """
+        Returns the value bytes stored for `key`, or None
+        """
+        if self.data is None:
+            self.open()
+        data = self.data
+        record_size = self.record_size
+        low = 0
+        high = self.count
+        while low < high:
+            middle = (low + high) >> 1
+            offset = HEADER.size + middle * record_size
+            middle_key = KEY.unpack_from(data, offset)[0]
+            if middle_key < key:
+                low = middle + 1
+            elif middle_key > key:
+                high = middle
+            else:
+                offset += KEY.size
+                return data[offset:offset + self.value_size]
+        return None
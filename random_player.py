@@ -1,5 +1,7 @@
 from random import randint
 
+from rays import DIRECTION_INDEX, get_rays
+
 class MyPlayer(object):
     '''
     Random reversi player class.
@@ -41,17 +43,11 @@ class MyPlayer(object):
         return False
 
     def confirm_direction(self,move,dx,dy,board,boardSize):
-        posx = move[0]+dx
-        posy = move[1]+dy
-        if (posx>=0) and (posx<boardSize) and (posy>=0) and (posy<boardSize):
+        covers_opponent = False
+        for posx, posy in get_rays(boardSize)[move[0]][move[1]][DIRECTION_INDEX[(dx, dy)]]:
             if board[posx][posy] == self.opponentColor:
-                while (posx>=0) and (posx<=(boardSize-1)) and (posy>=0) and (posy<=(boardSize-1)):
-                    posx += dx
-                    posy += dy
-                    if (posx>=0) and (posx<boardSize) and (posy>=0) and (posy<boardSize):
-                        if board[posx][posy] == -1:
-                            return False
-                        if board[posx][posy] == self.my_color:
-                            return True
+                covers_opponent = True
+            else:
+                return covers_opponent and board[posx][posy] == self.my_color
 
         return False
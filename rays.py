@@ -0,0 +1,46 @@
+"""
+Precomputed rays of the list-of-lists board.
+
+rays[row][col][direction] is a tuple of the (row, col) squares from [row, col]
+to the edge of the board in the direction, nearest first, so a walk along a
+direction is a loop over a tuple without index arithmetic or bounds checks.
+The directions are DIRECTION_STEPS (row step, col step), the opposite of
+direction i is (i + 4) % 8.
+"""
+
+DIRECTION_STEPS = ((1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1))
+# (row step, col step) -> index of the direction
+DIRECTION_INDEX = {step: index for index, step in enumerate(DIRECTION_STEPS)}
+
+
+def build_rays(size):
+    rays = []
+    for row in range(size):
+        row_rays = []
+        for col in range(size):
+            square_rays = []
+            for row_step, col_step in DIRECTION_STEPS:
+                ray = []
+                r, c = row + row_step, col + col_step
+                while 0 <= r < size and 0 <= c < size:
+                    ray.append((r, c))
+                    r += row_step
+                    c += col_step
+                square_rays.append(tuple(ray))
+            row_rays.append(tuple(square_rays))
+        rays.append(tuple(row_rays))
+    return tuple(rays)
+
+
+_rays = {}
+
+
+def get_rays(size):
+    # Ray table of a board size, built once per process
+    rays = _rays.get(size)
+    if rays is None:
+        rays = _rays[size] = build_rays(size)
+    return rays
+
+
+RAYS = get_rays(8)
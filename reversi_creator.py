@@ -4,9 +4,10 @@ import random_player
 #import heuristic_player
 
 from game_board import GameBoard
+from move_timing import MoveTimer
+from player_process import MoveTimeout, PlayerProcess
 from reversi_view import ReversiView
 import time
-import multiprocessing 
 import copy, getopt, sys
 
 class ReversiCreator(object):
@@ -26,6 +27,10 @@ class ReversiCreator(object):
         self.player2 = player_class(self.player2_color,self.player1_color)
         self.board = GameBoard()
         self.sleep_time_ms = 200
+        # Players run in worker processes, a move over this time is killed
+        self.move_limit_ms = 1000
+        # PlayerProcess of each color, replaced when the player changes
+        self.player_processes = {}
         self.gui = ReversiView(player_array)
         self.gui.set_game(self)
         self.gui.set_board(self.board)
@@ -39,6 +44,9 @@ class ReversiCreator(object):
         '''
         print('clear_game')
         self.max_times_ms = [0 , 0]
+        self.move_timer = MoveTimer()
+        # A new game starts the players in new processes
+        self.stop_player_processes()
         self.board.init_board()
         self.board.clear()
         stones = self.board.get_score()
@@ -53,18 +61,23 @@ class ReversiCreator(object):
         '''
         self.paused = to_pause
 
-    def get_player_move(self, q):
+    def get_player_process(self):
         '''
-        Returns current player move to Queue, meant for threaded call.  Now deprecaded.
-        :param q: Queue for returning the move with spent time.
+        Returns the worker process of the current player, its move() raises
+        MoveTimeout when the player runs over move_limit_ms.
         '''
-        start_time = time.time()
-        move = self.current_player.move(self.board.get_board_copy())
-        endTime = time.time()
-        moveTime = (endTime - start_time) * 1000
-        q.put({'time':moveTime, 'move':move})
+        worker = self.player_processes.get(self.current_player_color)
+        if worker is None or worker.player is not self.current_player:
+            if worker is not None:
+                worker.close()
+            worker = PlayerProcess(self.current_player, self.move_limit_ms)
+            self.player_processes[self.current_player_color] = worker
+        return worker
 
-        
+    def stop_player_processes(self):
+        for worker in self.player_processes.values():
+            worker.close()
+        self.player_processes = {}
 
     def play_game(self, interactivePlayerColor=-1):
         '''
@@ -82,38 +95,30 @@ class ReversiCreator(object):
                 inform_str = 'It is your turn'
                 self.gui.inform(inform_str, 'green')
                 break
-            #q = multiprocessing.Queue()
-            #p = multiprocessing.Process(target=self.get_player_move, args=(q,))
-            #p.start()
-            # Wait for 1 second
-            #p.join(1)
-            #if p.is_alive():
-            #    print("running too long - killing it")
-            #    p.terminate()
-            #    p.join()
-            #    player_move_overtime = self.current_player_color
-            #if player_move_overtime != -1:
-            #    inform_str = 'Player %d move took to long - killed' % (self.current_player_color)
-            #    self.gui.inform(inform_str, 'red')
-            #    break
-            #returned_move = q.get()
-            #move_time = returned_move['time']
-            #move = returned_move['move']
-            
-            start_time = time.time()
-            move = self.current_player.move(self.board.get_board_copy())
-            endTime = time.time()
-            move_time = (endTime - start_time) * 1000
-            
-            if move_time > 1000:
-                print("running too long - killing it")
+            stones = self.board.get_score()
+            empties = self.board.board_size ** 2 - stones[0] - stones[1]
+            worker = self.get_player_process()
+            start_time = time.perf_counter_ns()
+            try:
+                move = worker.move(self.board.get_board_copy())
+            except MoveTimeout:
+                # The worker process of the player was terminated at the time limit
+                move = None
+                player_move_overtime = self.current_player_color
+            elapsed_ns = time.perf_counter_ns() - start_time
+            move_time = elapsed_ns / 1e6
+            self.move_timer.record(self.current_player_color, empties, elapsed_ns,
+                                   worker.search_info)
+
+            if move_time > self.move_limit_ms:
                 player_move_overtime = self.current_player_color
-            
+
             if player_move_overtime != -1:
+                print("running too long - killing it")
                 inform_str = 'Player %d move took to long - killed' % (self.current_player_color)
                 self.gui.inform(inform_str, 'red')
                 break
-            
+
             self.max_times_ms[self.current_player_color] = max(self.max_times_ms[self.current_player_color], move_time)
             if move is None:
                 print('Move is not correct!!!!')
@@ -210,6 +215,8 @@ class ReversiCreator(object):
         elif stones[1] > stones[0]:
             who_wins = 'Player %d wins!' % (self.player2_color)
         print(who_wins)
+        for color, player in ((self.player1_color, self.player1), (self.player2_color, self.player2)):
+            self.move_timer.print_report(color, getattr(player, 'name', None))
         self.gui.inform([final_score, who_wins], 'green')
 
 if __name__ == "__main__": 
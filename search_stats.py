@@ -0,0 +1,111 @@
+"""
+Statistics of the alpha-beta search of MyPlayer.
+
+MyPlayer(..., stats_path='stats.jsonl') collects, for every move, the nodes,
+leaf evaluations, transposition table use, cutoffs by the index of the move
+causing them, the deepest ply reached and the time and nodes of every
+iteration of the iterative deepening, and appends them to the file as one
+JSON line. The search methods count through the player's SearchStats when
+statistics are enabled; without them each node only checks that there is
+none. Pondering is not counted, its nodes are in search_info['ponder_nodes'].
+
+Comparing two builds (e.g. before and after a change of the move ordering):
+
+>> python search_stats.py before.jsonl after.jsonl
+"""
+import json
+import sys
+import time
+
+
+class SearchStats:
+    """
+    Counters of the search of one move
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.leaf_evals = 0
+        self.tt_probes = 0
+        self.tt_cutoffs = 0  # probes whose stored score ended the search of the node
+        self.tt_moves = 0  # probes which gave a hash move to search first
+        self.max_ply = 0
+        self.iterations = []
+        self.iteration_start = time.perf_counter()
+
+    def count_node(self, ply, leaf):
+        if leaf:
+            self.leaf_evals += 1
+        if ply > self.max_ply:
+            self.max_ply = ply
+
+    def count_probe(self, score, hash_move):
+        # A transposition table probe returning (score or None, hash move or None)
+        self.tt_probes += 1
+        if score is not None:
+            self.tt_cutoffs += 1
+        elif hash_move is not None:
+            self.tt_moves += 1
+
+    def end_iteration(self, depth, nodes, completed=True):
+        # Called when the iteration of `depth` is done (or stopped by the deadline)
+        now = time.perf_counter()
+        self.iterations.append({'depth': depth, 'time_ms': (now - self.iteration_start) * 1000,
+                                'nodes': nodes, 'completed': completed})
+        self.iteration_start = now
+
+    def record(self, **fields):
+        """
+        The statistics of the move as a dict for the JSON line, `fields`
+        (nodes, cutoffs, ...) come from the player
+        """
+        record = dict(fields)
+        record.update({'leaf_evals': self.leaf_evals, 'tt_probes': self.tt_probes,
+                       'tt_cutoffs': self.tt_cutoffs, 'tt_moves': self.tt_moves,
+                       'max_ply': self.max_ply, 'iterations': self.iterations})
+        # Nodes of an iteration per node of the previous one
+        nodes = [0] + [iteration['nodes'] for iteration in self.iterations if iteration['completed']]
+        counts = [later - earlier for earlier, later in zip(nodes, nodes[1:])]
+        record['branching'] = [later / earlier for earlier, later in zip(counts, counts[1:]) if earlier]
+        return record
+
+
+def read_records(path):
+    with open(path) as stats_file:
+        return [json.loads(line) for line in stats_file if line.strip()]
+
+
+def summarize(records):
+    """
+    Totals of the searched moves of a statistics file
+    """
+    searched = [record for record in records if record['nodes']]
+    count = len(searched) or 1
+    nodes = sum(record['nodes'] for record in searched)
+    time_ms = sum(record['time_ms'] for record in searched)
+    cutoffs = [sum(column) for column in zip(*(record['cutoffs'] for record in searched))] or [0]
+    probes = sum(record['tt_probes'] for record in searched)
+    branching = [factor for record in searched for factor in record['branching']]
+    return {
+        'moves': len(searched),
+        'nodes_per_move': nodes / count,
+        'nps': nodes / time_ms * 1000 if time_ms else 0.0,
+        'mean_depth': sum(record['depth'] for record in searched) / count,
+        'leaf_evals_per_move': sum(record['leaf_evals'] for record in searched) / count,
+        'first_move_cutoff_rate': cutoffs[0] / sum(cutoffs) if sum(cutoffs) else 0.0,
+        'tt_cutoff_rate': sum(record['tt_cutoffs'] for record in searched) / probes if probes else 0.0,
+        'tt_move_rate': sum(record['tt_moves'] for record in searched) / probes if probes else 0.0,
+        'mean_branching': sum(branching) / len(branching) if branching else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print('Usage: python search_stats.py stats.jsonl [another_stats.jsonl ...]')
+        sys.exit(1)
+    summaries = [summarize(read_records(path)) for path in sys.argv[1:]]
+    print('%-24s' % '' + ''.join('%16s' % path[-16:] for path in sys.argv[1:]))
+    for key in summaries[0]:
+        print('%-24s' % key + ''.join('%16.3f' % summary[key] for summary in summaries))
@@ -0,0 +1,127 @@
+"""
+Self-play games for training the evaluation weights (see train_weights.py).
+
+MyPlayer plays against itself with the headless driver, in a pool of worker
+processes. The first plies of every game are random, so the games do not
+repeat. Every position a player is asked to move in is stored together with
+the final disc difference of the game for that player.
+
+Dataset format: fixed-size little endian records appended to one file, own
+discs (uint64) and opponent discs (uint64) of the player to move, final disc
+difference for the player to move (int8).
+
+>> python self_play.py -g 10000 -t 20 -r 10 -o selfplay.dat
+
+-g  number of games (default 1000)
+-t  time limit of MyPlayer in ms (default 20)
+-r  number of random plies at the start of a game (default 10)
+-w  number of worker processes (default: number of CPU cores)
+-o  dataset file, records are appended (default selfplay.dat)
+"""
+import getopt
+import multiprocessing
+import os
+import random
+import struct
+import sys
+import time
+from contextlib import redirect_stdout
+
+from bitboard import from_board, iter_squares, legal_moves, popcount
+from headless_reversi_creator import QUIET, HeadlessReversiCreator
+
+RECORD = struct.Struct('<QQb')
+
+P1_COLOR = 0
+P2_COLOR = 1
+
+
+class RecordingPlayer:
+    """
+    Plays random moves for the first `random_plies` plies, then the moves of
+    `player`, and records the positions it moves in as (own, opp)
+    """
+
+    def __init__(self, player, my_color, opponent_color, random_plies, rng):
+        self.player = player
+        self.name = player.name
+        self.my_color = my_color
+        self.opponent_color = opponent_color
+        self.random_plies = random_plies
+        self.rng = rng
+        self.positions = []
+
+    def move(self, board):
+        own, opp = from_board(board, self.my_color, self.opponent_color)
+        self.positions.append((own, opp))
+        if popcount(own | opp) - 4 < self.random_plies:
+            sq = self.rng.choice(list(iter_squares(legal_moves(own, opp))))
+            return sq // 8, sq % 8
+        return self.player.move(board)
+
+
+def play_game(task):
+    """
+    Plays one self-play game, returns its dataset records as bytes
+    (empty when the game did not end regularly)
+    """
+    index, time_limit_ms, random_plies, seed = task
+    import player  # imported in the worker process
+    rng = random.Random(seed * 1000003 + index)
+    recorders = {}
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        for color in (P1_COLOR, P2_COLOR):
+            # The book is left out, the games should explore the openings
+            searcher = player.MyPlayer(color, 1 - color, time_limit_ms=time_limit_ms, book_path=None)
+            recorders[color] = RecordingPlayer(searcher, color, 1 - color, random_plies, rng)
+        game = HeadlessReversiCreator(recorders[P1_COLOR], P1_COLOR, recorders[P2_COLOR], P2_COLOR, 8, QUIET)
+        result = game.play_game()
+    if result is None or result == 100:
+        return b''
+
+    stones = game.board.get_score()
+    records = bytearray()
+    for color, recorder in recorders.items():
+        disc_diff = stones[color] - stones[1 - color]
+        for own, opp in recorder.positions:
+            records += RECORD.pack(own, opp, disc_diff)
+    return bytes(records)
+
+
+def generate(path, games, time_limit_ms=20, random_plies=10, workers=None, seed=None):
+    """
+    Appends the positions of `games` self-play games to the dataset at `path`,
+    returns the number of records written
+    """
+    if seed is None:
+        seed = int(time.time())
+    tasks = [(index, time_limit_ms, random_plies, seed) for index in range(games)]
+    written = 0
+    with open(path, 'ab') as dataset, multiprocessing.Pool(workers) as pool:
+        for done, records in enumerate(pool.imap_unordered(play_game, tasks), 1):
+            dataset.write(records)
+            written += len(records) // RECORD.size
+            if done % 100 == 0:
+                print('%d games, %d positions' % (done, written))
+    return written
+
+
+def read_dataset(path):
+    # [(own, opp, disc difference)] of a dataset file, for small datasets and checks
+    with open(path, 'rb') as dataset:
+        data = dataset.read()
+    return list(RECORD.iter_unpack(data[:len(data) - len(data) % RECORD.size]))
+
+
+if __name__ == "__main__":
+    (choices, args) = getopt.getopt(sys.argv[1:], "g:t:r:w:o:")
+    options = dict(choices)
+    games = int(options.get('-g', 1000))
+    time_limit_ms = int(options.get('-t', 20))
+    random_plies = int(options.get('-r', 10))
+    workers = int(options['-w']) if '-w' in options else None
+    path = options.get('-o', 'selfplay.dat')
+
+    start = time.time()
+    count = generate(path, games, time_limit_ms, random_plies, workers)
+    print('%d positions of %d games appended to %s in %.1f s' % (count, games, path, time.time() - start))
@@ -0,0 +1,60 @@
+"""
+The list-of-lists helpers of MyPlayer on boards other than 8x8, checked
+against GameBoard along random games.
+
+>> python -m pytest test_player.py
+"""
+import random
+
+import pytest
+
+from game_board import GameBoard
+import player
+
+MY_COLOR = 0
+OPPONENT_COLOR = 1
+
+
+def random_boards(size, games=3, seed=1):
+    # GameBoards of every position of a few random games, color 0 moves first
+    rng = random.Random(seed)
+    for _ in range(games):
+        game_board = GameBoard(size)
+        color = MY_COLOR
+        while game_board.can_play(MY_COLOR) or game_board.can_play(OPPONENT_COLOR):
+            if not game_board.can_play(color):
+                color = 1 - color
+            yield game_board, color
+            move = rng.choice(sorted(game_board.get_legal_moves(color)))
+            game_board.play_move(move, color)
+            color = 1 - color
+
+
+@pytest.fixture(scope='module')
+def searcher():
+    return player.MyPlayer(MY_COLOR, OPPONENT_COLOR, book_path=None)
+
+
+@pytest.mark.parametrize('size', [6, 10])
+def test_find_moves_and_count_score(searcher, size):
+    for game_board, color in random_boards(size):
+        board = game_board.get_board_copy()
+        legal = set(game_board.get_legal_moves(color))
+        moves = searcher.find_moves(board, color, 1 - color)
+        assert len(moves) == len(legal)
+        assert {tuple(move) for move in moves} == legal
+        assert {tuple(move) for move in searcher.find_midgame_moves(board, color == MY_COLOR)} == legal
+        score = game_board.get_score()
+        assert searcher.count_score(board, MY_COLOR) == score[MY_COLOR]
+        assert searcher.count_score(board, OPPONENT_COLOR) == score[OPPONENT_COLOR]
+
+
+@pytest.mark.parametrize('size', [6, 10])
+def test_repaint_the_board(searcher, size):
+    for game_board, color in random_boards(size, games=1, seed=2):
+        snapshot = game_board.snapshot()
+        for row, col in sorted(game_board.get_legal_moves(color)):
+            board = searcher.repaint_the_board(game_board.get_board_copy(), row, col, color == MY_COLOR)
+            game_board.play_move((row, col), color)
+            assert board == game_board.get_board_copy()
+            game_board.restore(snapshot)
@@ -0,0 +1,154 @@
+"""
+Tournament between two players without the GUI.
+
+Plays many games of two player modules in a pool of worker processes,
+alternating colors every game and with the game output turned off, then prints
+wins/losses/draws, disc differentials and move latency percentiles.
+
+>> python tournament.py player random_player
+>> python tournament.py -g 2000 -w 8 -t 100 player random_player
+
+-g  number of games (default 100)
+-w  number of worker processes (default: number of CPU cores)
+-t  time limit in ms handed to players that have a time_limit_ms attribute
+-s  board size (default 8)
+"""
+import getopt
+import multiprocessing
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+from headless_reversi_creator import QUIET, HeadlessReversiCreator
+from move_timing import MoveTimer
+
+P1_COLOR = 0
+P2_COLOR = 1
+# The latencies of the tournament are kept per player, under these colors of a MoveTimer
+SIDE_A = 0
+SIDE_B = 1
+
+
+def import_player(name):
+    if ".py" in name:
+        name = name.replace(".py", "")
+    return __import__(name)
+
+
+def play_game(task):
+    """
+    Plays one game. Player A (first module) has the first color in even games.
+    Returns the result from the point of view of player A.
+    """
+    index, name_a, name_b, time_limit_ms, board_size = task
+    module_a = import_player(name_a)
+    module_b = import_player(name_b)
+    if index % 2 == 0:
+        a_color, b_color = P1_COLOR, P2_COLOR
+    else:
+        a_color, b_color = P2_COLOR, P1_COLOR
+
+    # The creator prints nothing with QUIET, the players may print though
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        player_a = module_a.MyPlayer(a_color, b_color)
+        player_b = module_b.MyPlayer(b_color, a_color)
+        for player in (player_a, player_b):
+            if time_limit_ms is not None and hasattr(player, 'time_limit_ms'):
+                player.time_limit_ms = time_limit_ms
+        if a_color == P1_COLOR:
+            game = HeadlessReversiCreator(player_a, a_color, player_b, b_color, board_size, QUIET)
+        else:
+            game = HeadlessReversiCreator(player_b, b_color, player_a, a_color, board_size, QUIET)
+        # Also closes the players
+        result = game.play_game()
+
+    stones = game.board.get_score()
+    a_discs = stones[0] if a_color == P1_COLOR else stones[1]
+    b_discs = stones[1] if a_color == P1_COLOR else stones[0]
+    forfeit = None
+    if result == 100 or result is None:
+        # The player on move lost by running out of time or by a wrong move
+        forfeit = 'timeout' if result == 100 else 'wrong_move'
+        outcome = 'loss' if game.current_player_color == a_color else 'win'
+    elif result == -1:
+        outcome = 'draw'
+    else:
+        winner_color = P1_COLOR if result == 0 else P2_COLOR
+        outcome = 'win' if winner_color == a_color else 'loss'
+
+    return {
+        'index': index,
+        'a_color': a_color,
+        'outcome': outcome,
+        'forfeit': forfeit,
+        'disc_diff': a_discs - b_discs,
+        'move_timer': game.move_timer,
+    }
+
+
+def summarize(results):
+    """
+    Aggregates the results of play_game
+    """
+    summary = {'games': len(results), 'wins': 0, 'losses': 0, 'draws': 0,
+               'a_timeouts': 0, 'b_timeouts': 0, 'a_wrong_moves': 0, 'b_wrong_moves': 0}
+    timer = MoveTimer()
+    disc_diffs = []
+    for game in results:
+        summary[{'win': 'wins', 'loss': 'losses', 'draw': 'draws'}[game['outcome']]] += 1
+        if game['forfeit'] is not None:
+            offender = 'a' if game['outcome'] == 'loss' else 'b'
+            summary['%s_%ss' % (offender, game['forfeit'])] += 1
+        disc_diffs.append(game['disc_diff'])
+        a_color = game['a_color']
+        timer.merge(game['move_timer'], {a_color: SIDE_A, 1 - a_color: SIDE_B})
+    summary['mean_disc_diff'] = sum(disc_diffs) / len(disc_diffs) if disc_diffs else 0.0
+    summary['min_disc_diff'] = min(disc_diffs) if disc_diffs else 0
+    summary['max_disc_diff'] = max(disc_diffs) if disc_diffs else 0
+    summary['a_latency_ms'] = timer.histogram(SIDE_A).summary_ms()
+    summary['b_latency_ms'] = timer.histogram(SIDE_B).summary_ms()
+    return summary
+
+
+def run_tournament(name_a, name_b, games=100, workers=None, time_limit_ms=None, board_size=8):
+    """
+    Plays `games` games of player module `name_a` against `name_b`
+    and returns the summary of the results
+    """
+    tasks = [(index, name_a, name_b, time_limit_ms, board_size) for index in range(games)]
+    if workers == 1:
+        results = [play_game(task) for task in tasks]
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            results = list(pool.imap_unordered(play_game, tasks))
+    return summarize(results)
+
+
+def print_summary(name_a, name_b, summary, seconds):
+    print('%s vs %s: %d games in %.1f s' % (name_a, name_b, summary['games'], seconds))
+    print('%s wins: %d, losses: %d, draws: %d' % (name_a, summary['wins'], summary['losses'], summary['draws']))
+    print('Disc differential for %s: mean %+.2f, min %+d, max %+d' % (
+        name_a, summary['mean_disc_diff'], summary['min_disc_diff'], summary['max_disc_diff']))
+    for name, side in ((name_a, 'a'), (name_b, 'b')):
+        latency = summary['%s_latency_ms' % side]
+        print('%s: %d time-outs, %d wrong moves' % (
+            name, summary['%s_timeouts' % side], summary['%s_wrong_moves' % side]))
+        print('%s move latency [ms]: mean %.2f, p50 %.2f, p95 %.2f, p99 %.2f, max %.2f (%d moves)' % (
+            name, latency['mean'], latency['p50'], latency['p95'], latency['p99'], latency['max'], latency['moves']))
+
+
+if __name__ == "__main__":
+    (choices, args) = getopt.getopt(sys.argv[1:], "g:w:t:s:")
+    options = dict(choices)
+    if len(args) != 2:
+        print('Usage: python tournament.py [-g games] [-w workers] [-t time_limit_ms] [-s board_size] player another_player')
+        sys.exit(1)
+    games = int(options.get('-g', 100))
+    workers = int(options['-w']) if '-w' in options else None
+    time_limit_ms = int(options['-t']) if '-t' in options else None
+    board_size = int(options.get('-s', 8))
+
+    start = time.time()
+    summary = run_tournament(args[0], args[1], games, workers, time_limit_ms, board_size)
+    print_summary(args[0], args[1], summary, time.time() - start)
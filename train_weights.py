@@ -0,0 +1,149 @@
+"""
+Fits the pattern weights of evaluation.py to a self-play dataset.
+
+For every phase the weights are fitted by gradient descent on the squared
+error between the evaluation (the sum of the weights of the 34 pattern
+configurations of a position) and the final disc difference of the game.
+The step of every weight is divided by the number of positions it occurs in,
+so rare configurations learn as fast as common ones. Positions are used in
+all 8 symmetric orientations. Phases without positions keep the default
+weights.
+
+Requires NumPy.
+
+>> python self_play.py -g 10000 -o selfplay.dat
+>> python train_weights.py -i selfplay.dat -e 300 -o eval_weights.bin
+
+-i  dataset file (default selfplay.dat)
+-e  number of gradient descent epochs (default 300)
+-l  learning rate (default 1.0)
+-o  weight file (default eval_weights.bin next to evaluation.py), MyPlayer loads it at startup
+"""
+import array
+import getopt
+import sys
+import time
+
+import numpy as np
+
+from batch_moves import square_bits
+from evaluation import (DEFAULT_WEIGHTS_PATH, EVAL_SCALE, INSTANCES, N_PHASES, PHASE_SIZE,
+                        TABLE_OFFSETS, default_weights, eval_phase, save_weights)
+
+DATASET_DTYPE = np.dtype([('own', '<u8'), ('opp', '<u8'), ('score', 'i1')])
+L2 = 0.001  # pulls weights of configurations with few positions towards zero
+
+
+def load_dataset(path):
+    return np.fromfile(path, dtype=DATASET_DTYPE)
+
+
+def _u64(value):
+    return np.uint64(value)
+
+
+def flip_vertical(bb):
+    bb = ((bb >> _u64(8)) & _u64(0x00FF00FF00FF00FF)) | ((bb & _u64(0x00FF00FF00FF00FF)) << _u64(8))
+    bb = ((bb >> _u64(16)) & _u64(0x0000FFFF0000FFFF)) | ((bb & _u64(0x0000FFFF0000FFFF)) << _u64(16))
+    return (bb >> _u64(32)) | (bb << _u64(32))
+
+
+def mirror_horizontal(bb):
+    bb = ((bb >> _u64(1)) & _u64(0x5555555555555555)) | ((bb & _u64(0x5555555555555555)) << _u64(1))
+    bb = ((bb >> _u64(2)) & _u64(0x3333333333333333)) | ((bb & _u64(0x3333333333333333)) << _u64(2))
+    return ((bb >> _u64(4)) & _u64(0x0F0F0F0F0F0F0F0F)) | ((bb & _u64(0x0F0F0F0F0F0F0F0F)) << _u64(4))
+
+
+def transpose(bb):
+    t = _u64(0x0F0F0F0F00000000) & (bb ^ (bb << _u64(28)))
+    bb = bb ^ t ^ (t >> _u64(28))
+    t = _u64(0x3333000033330000) & (bb ^ (bb << _u64(14)))
+    bb = bb ^ t ^ (t >> _u64(14))
+    t = _u64(0x5500550055005500) & (bb ^ (bb << _u64(7)))
+    return bb ^ t ^ (t >> _u64(7))
+
+
+def symmetry(bb, index):
+    # Vectorized opening_book.symmetry for uint64 arrays
+    if index & 1:
+        bb = flip_vertical(bb)
+    if index & 2:
+        bb = mirror_horizontal(bb)
+    if index & 4:
+        bb = transpose(bb)
+    return bb
+
+
+def pattern_index_matrix(own, opp):
+    """
+    (N, number of pattern instances) weight indices of the positions, the
+    same as evaluation.pattern_indices of every row
+    """
+    states = square_bits(own) + 2 * square_bits(opp)  # 0 empty, 1 own, 2 opponent
+    indices = np.empty((len(own), len(INSTANCES)), dtype=np.int32)
+    for column, (kind, squares) in enumerate(INSTANCES):
+        powers = 3 ** np.arange(len(squares), dtype=np.int32)
+        indices[:, column] = states[:, squares].astype(np.int32) @ powers + TABLE_OFFSETS[kind]
+    return indices
+
+
+def fit_phase(indices, targets, epochs, learning_rate):
+    """
+    Weights (in discs) of one phase minimizing the squared error of
+    indices -> targets
+    """
+    _, n_features = indices.shape
+    flat = indices.ravel()
+    counts = np.bincount(flat, minlength=PHASE_SIZE)
+    step = learning_rate / n_features / np.maximum(counts, 1)
+    weights = np.zeros(PHASE_SIZE)
+    for epoch in range(epochs):
+        errors = targets - weights[indices].sum(axis=1)
+        gradient = np.bincount(flat, weights=np.repeat(errors, n_features), minlength=PHASE_SIZE)
+        weights += step * gradient - learning_rate * L2 * weights
+        if epoch % 50 == 0 or epoch == epochs - 1:
+            print('  epoch %d: mean squared error %.3f' % (epoch, float(np.mean(errors ** 2))))
+    return weights
+
+
+def fit_weights(dataset, epochs=300, learning_rate=1.0):
+    """
+    Returns the int16 weight arrays of all phases fitted to the dataset
+    """
+    # The number of empty squares does not change with the orientation
+    empties = 64 - square_bits(dataset['own'] | dataset['opp']).sum(axis=1)
+    phases = np.tile(np.array([eval_phase(e) for e in range(65)])[empties], 8)
+    own = np.concatenate([symmetry(dataset['own'], index) for index in range(8)])
+    opp = np.concatenate([symmetry(dataset['opp'], index) for index in range(8)])
+    targets = np.tile(dataset['score'].astype(np.float64), 8)
+
+    fallback = default_weights()
+    weights = []
+    for phase in range(N_PHASES):
+        selected = phases == phase
+        print('phase %d: %d positions' % (phase, int(selected.sum())))
+        if not selected.any():
+            weights.append(fallback[phase])
+            continue
+        fitted = fit_phase(pattern_index_matrix(own[selected], opp[selected]), targets[selected],
+                           epochs, learning_rate)
+        scaled = np.clip(np.rint(fitted * EVAL_SCALE), -32768, 32767).astype(np.int16)
+        phase_weights = array.array('h')
+        phase_weights.frombytes(scaled.tobytes())
+        weights.append(phase_weights)
+    return weights
+
+
+if __name__ == "__main__":
+    (choices, args) = getopt.getopt(sys.argv[1:], "i:e:l:o:")
+    options = dict(choices)
+    dataset_path = options.get('-i', 'selfplay.dat')
+    epochs = int(options.get('-e', 300))
+    learning_rate = float(options.get('-l', 1.0))
+    path = options.get('-o', DEFAULT_WEIGHTS_PATH)
+
+    start = time.time()
+    dataset = load_dataset(dataset_path)
+    print('%d positions in %s' % (len(dataset), dataset_path))
+    save_weights(path, fit_weights(dataset, epochs, learning_rate))
+    print('weights written to %s in %.1f s' % (path, time.time() - start))
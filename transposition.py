@@ -0,0 +1,106 @@
+"""
+Transposition table for the alpha-beta search.
+
+Positions are identified by 64-bit Zobrist keys. A key is the XOR of one
+random number per (disc owner, square); the keys of all discs in one byte of
+a bitboard are pre-combined into 256-entry tables, so hashing a position
+costs 16 table lookups instead of a loop over its discs. ZobristKeys does
+the same for boards of other sizes.
+"""
+import random
+
+EXACT = 0
+LOWER = 1  # the search failed high, the real score is at least `score`
+UPPER = 2  # the search failed low, the real score is at most `score`
+
+
+def _byte_tables(rng, n_bytes=8):
+    tables = []
+    for _ in range(n_bytes):
+        square_keys = [rng.getrandbits(64) for _ in range(8)]
+        table = [0] * 256
+        for value in range(1, 256):
+            low = value & -value
+            table[value] = table[value ^ low] ^ square_keys[low.bit_length() - 1]
+        tables.append(table)
+    return tables
+
+
+# Fixed seed: keys are the same in every process and every run
+_rng = random.Random(0x5EED)
+_O0, _O1, _O2, _O3, _O4, _O5, _O6, _O7 = _byte_tables(_rng)
+_P0, _P1, _P2, _P3, _P4, _P5, _P6, _P7 = _byte_tables(_rng)
+# XORed in when the opponent (not the searching player) is to move
+SIDE_KEY = _rng.getrandbits(64)
+
+
+def zobrist_key(own, opp):
+    """
+    Zobrist key of the position with `own` discs for the player to move
+    """
+    return (_O0[own & 255] ^ _O1[(own >> 8) & 255] ^ _O2[(own >> 16) & 255] ^
+            _O3[(own >> 24) & 255] ^ _O4[(own >> 32) & 255] ^
+            _O5[(own >> 40) & 255] ^ _O6[(own >> 48) & 255] ^ _O7[own >> 56] ^
+            _P0[opp & 255] ^ _P1[(opp >> 8) & 255] ^ _P2[(opp >> 16) & 255] ^
+            _P3[(opp >> 24) & 255] ^ _P4[(opp >> 32) & 255] ^
+            _P5[(opp >> 40) & 255] ^ _P6[(opp >> 48) & 255] ^ _P7[opp >> 56])
+
+
+class ZobristKeys:
+    """
+    64-bit Zobrist keys of the positions of a board with `n_squares` squares
+    (zobrist_key is the unrolled 8x8 version)
+    """
+
+    def __init__(self, n_squares):
+        # Fixed seed per board size, like the 8x8 keys
+        rng = random.Random(0x5EED + n_squares)
+        n_bytes = (n_squares + 7) // 8
+        self.own_tables = _byte_tables(rng, n_bytes)
+        self.opp_tables = _byte_tables(rng, n_bytes)
+
+    def key(self, own, opp):
+        """
+        Key of the position with `own` discs for the player to move
+        """
+        key = 0
+        for own_table, opp_table in zip(self.own_tables, self.opp_tables):
+            key ^= own_table[own & 255] ^ opp_table[opp & 255]
+            own >>= 8
+            opp >>= 8
+        return key
+
+
+class TranspositionTable:
+    """
+    Fixed-size hash table of search results.
+    Every slot holds one entry (key, depth, bound, score, best_move, generation).
+    A slot is replaced when it is empty, was written during an older search
+    (older call of MyPlayer.move) or when the new result is at least as deep.
+    """
+
+    def __init__(self, size_bits=18):
+        self.size = 1 << size_bits
+        self.mask = self.size - 1
+        self.entries = [None] * self.size
+        self.generation = 0
+
+    def clear(self):
+        self.entries = [None] * self.size
+        self.generation = 0
+
+    def new_search(self):
+        # Entries of previous searches stay usable but may be replaced
+        self.generation += 1
+
+    def probe(self, key):
+        entry = self.entries[key & self.mask]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key, depth, bound, score, best_move):
+        index = key & self.mask
+        old = self.entries[index]
+        if old is None or old[5] != self.generation or depth >= old[1]:
+            self.entries[index] = (key, depth, bound, score, best_move, self.generation)